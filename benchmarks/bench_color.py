@@ -0,0 +1,101 @@
+"""
+Latency and color distance of `extract_theme_colors` (binned, weighted k-means)
+against the previous scikit-learn KMeans over every pixel of the full-size image.
+
+The distance is measured in RGBA: the mean distance from the old centers to the nearest
+new center, the quantization error of each palette over the pixels, and the distance
+between the light colors picked first (the embed color).
+
+Run from the repository root: python -m benchmarks.bench_color
+scikit-learn is optional, without it only the new extraction is timed.
+"""
+
+import time
+
+import numpy as np
+
+from PIL import Image
+
+from czbook.color import brightness, extract_theme_colors
+
+RUNS = 3
+IMAGES = 5
+# the size of a thumbnail of the site
+SIZE = (300, 400)
+NUM_COLORS = 10
+
+try:
+    from sklearn.cluster import KMeans
+except ImportError:
+    KMeans = None
+
+
+def thumbnail(rng: np.random.Generator) -> Image.Image:
+    """A cover-like image: a gradient background, a few solid shapes and noise."""
+    width, height = SIZE
+    y, x = np.mgrid[0:height, 0:width]
+    start, end = rng.integers(0, 256, (2, 3))
+    pixels = start + (end - start) * (y / height)[..., None]
+    for _ in range(6):
+        cx, cy, radius = rng.integers(0, width), rng.integers(0, height), rng.integers(20, 120)
+        pixels[(x - cx) ** 2 + (y - cy) ** 2 < radius**2] = rng.integers(0, 256, 3)
+    pixels += rng.normal(0, 8, pixels.shape)
+    alpha = np.full((height, width, 1), 255)
+    return Image.fromarray(
+        np.concatenate([pixels.clip(0, 255), alpha], axis=2).astype(np.uint8), "RGBA"
+    )
+
+
+def old_extract_theme_colors(image: Image.Image, num_colors=10) -> list[list[int]]:
+    image_array = np.array(image.convert("RGBA"))
+    k_means = KMeans(n_clusters=num_colors, n_init="auto", random_state=0)
+    k_means.fit(image_array.reshape((-1, 4)))
+    return k_means.cluster_centers_.astype(int).tolist()
+
+
+def _best(func, *args) -> tuple[float, object]:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def _nearest(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    return np.sqrt(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)).min(axis=1)
+
+
+def _first_light(colors: list[list[int]]) -> np.ndarray:
+    light = [color for color in colors if 0.2 < brightness(color) < 0.9]
+    return np.array(max(light or colors, key=brightness), dtype=float)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    images = [thumbnail(rng) for _ in range(IMAGES)]
+    print(f"{IMAGES} images of {SIZE[0]}x{SIZE[1]}, {NUM_COLORS} colors, best of {RUNS}")
+    if KMeans is None:
+        print("scikit-learn isn't installed, timing the new extraction only")
+
+    for i, image in enumerate(images):
+        new_ms, new = _best(extract_theme_colors, image.copy(), NUM_COLORS)
+        if KMeans is None:
+            print(f"image {i}  new {new_ms:7.1f} ms")
+            continue
+        old_ms, old = _best(old_extract_theme_colors, image, NUM_COLORS)
+
+        pixels = np.asarray(image, dtype=float).reshape((-1, 4))
+        old_centers, new_centers = np.array(old, dtype=float), np.array(new, dtype=float)
+        print(
+            f"image {i}  old {old_ms:7.1f} ms  new {new_ms:7.1f} ms"
+            f"  center distance {_nearest(old_centers, new_centers).mean():5.1f}"
+            f"  error old {_nearest(pixels, old_centers).mean():5.1f}"
+            f" new {_nearest(pixels, new_centers).mean():5.1f}"
+            f"  light color distance"
+            f" {np.linalg.norm(_first_light(old) - _first_light(new)):5.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
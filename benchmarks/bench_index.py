@@ -0,0 +1,89 @@
+"""
+Build time, size and lookup latency of `ContentIndex` against the `str.find` scan of
+every chapter, on a synthetic novel with a skewed character distribution.
+
+Run from the repository root: python -m benchmarks.bench_index
+"""
+
+import time
+
+import numpy as np
+
+import czbook
+from czbook.content import _search_content_pos
+
+RUNS = 5
+CHAPTERS = 1000
+CHAPTER_LENGTH = 5000
+# distinct characters, drawn with a Zipf-like distribution as in a real text
+ALPHABET = 3000
+
+
+def novel_chapters(rng: np.random.Generator) -> czbook.ChapterList:
+    alphabet = np.array([chr(0x4E00 + i) for i in range(ALPHABET)])
+    weights = 1 / np.arange(1, ALPHABET + 1)
+    chars = rng.choice(alphabet, CHAPTERS * CHAPTER_LENGTH, p=weights / weights.sum())
+    text = "".join(chars)
+    return czbook.ChapterList(
+        [
+            czbook.ChapterInfo(
+                f"第{i}章",
+                f"https://czbooks.net/n/x/{i}",
+                text[i * CHAPTER_LENGTH : (i + 1) * CHAPTER_LENGTH],
+            )
+            for i in range(CHAPTERS)
+        ]
+    )
+
+
+def _best(func, *args) -> tuple[float, object]:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def scan(chapter_list: czbook.ChapterList, keyword: str) -> list[tuple[int, int]]:
+    return [
+        (index, position)
+        for index, chapter in enumerate(chapter_list)
+        for position in _search_content_pos(chapter.content, keyword)
+    ]
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    chapter_list = novel_chapters(rng)
+    text = chapter_list[0].content
+
+    build_ms, index = _best(czbook.ContentIndex.build, chapter_list)
+    data = index.to_bytes()
+    load_ms, _ = _best(czbook.ContentIndex.from_bytes, data)
+    print(
+        f"{CHAPTERS} chapters of {CHAPTER_LENGTH} characters, best of {RUNS}\n"
+        f"build {build_ms:.0f} ms, {index.size / 1024**2:.1f} MB in memory,"
+        f" {len(data) / 1024**2:.1f} MB stored, loaded in {load_ms:.0f} ms"
+    )
+
+    keywords = [text[10 : 10 + length] for length in (1, 2, 3, 4, 8)]
+    # the most common characters, rare characters only, and a keyword which isn't in the content
+    keywords += [chr(0x4E00), chr(0x4E00) + chr(0x4E01)]
+    keywords += [chr(0x4E00 + ALPHABET - 1) * 2, "不存在的關鍵字"]
+    saved = 0.0
+    for keyword in keywords:
+        scan_ms, expected = _best(scan, chapter_list, keyword)
+        index_ms, found = _best(index.search, keyword)
+        # the scan skips position 0
+        assert [hit for hit in found if hit[1]] == expected, keyword
+        saved += scan_ms - index_ms
+        print(
+            f"{keyword!r:20} {len(expected):7} hits"
+            f"  scan {scan_ms:7.1f} ms  index {index_ms:7.1f} ms"
+        )
+    print(f"the build pays off after about {build_ms / (saved / len(keywords)):.1f} searches")
+
+
+if __name__ == "__main__":
+    main()
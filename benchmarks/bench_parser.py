@@ -0,0 +1,120 @@
+"""
+Parse time of each page type, a full html.parser tree against `parse_html`
+(lxml when installed, with the strainer of the page), both followed by the same lookups.
+
+Run from the repository root: python -m benchmarks.bench_parser
+"""
+
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from czbook.parser import PARSER, parse_html
+
+RUNS = 5
+
+
+def _noise(rng: random.Random, blocks: int) -> str:
+    # navigation, scripts and comments around the nodes the parser needs
+    return "".join(
+        f'<div class="sidebar"><a href="/c/{i}">分類{i}</a><span>{rng.random()}</span></div>'
+        f"<script>var x{i} = {i};</script>"
+        f'<div class="comment"><p>評論{i}' + "好看" * rng.randint(5, 30) + "</p></div>"
+        for i in range(blocks)
+    )
+
+
+def novel_page(rng: random.Random, chapters: int = 3000) -> str:
+    states = ["狀態", "連載中", "字數", "100萬", "觀看", "12345", "更新", "2024-01-01", "分類"]
+    return (
+        f"<html><head><title>書名</title></head><body>{_noise(rng, 200)}"
+        '<div class="novel-detail"><span class="title">書名</span>'
+        '<span class="author"><b>作者</b><a href="/a/x">作者名</a></span>'
+        '<img src="https://img.czbooks.net/x.jpg"/>'
+        '<div class="description">' + "簡介" * 200 + "</div></div>"
+        '<div class="state"><table><tr>'
+        + "".join(f"<td>{state}</td>" for state in states)
+        + '<td><a href="//czbooks.net/c/x">玄幻</a></td></tr></table></div>'
+        '<ul class="hashtag">'
+        + "".join(f'<li><a href="/hashtag/{i}">標籤{i}</a></li>' for i in range(10))
+        + '<li><a href="/hashtag">更多</a></li></ul><ul id="chapter-list" class="nav chapter-list">'
+        + "".join(f'<li><a href="//czbooks.net/n/x/{i}">第{i}章</a></li>' for i in range(chapters))
+        + f"</ul>{_noise(rng, 200)}</body></html>"
+    )
+
+
+def chapter_page(rng: random.Random, length: int = 5000) -> str:
+    text = "".join(rng.choices("天地玄黃宇宙洪荒日月盈昃辰宿列張", k=length))
+    return (
+        f"<html><body>{_noise(rng, 100)}"
+        f'<div class="content">{"<br/>".join(text[i:i + 50] for i in range(0, length, 50))}</div>'
+        f"{_noise(rng, 100)}</body></html>"
+    )
+
+
+def search_page(rng: random.Random, results: int = 20) -> str:
+    return (
+        f"<html><body>{_noise(rng, 100)}"
+        '<ul class="nav novel-list style-default">'
+        + "".join(
+            f'<li class="novel-item-wrapper"><a href="//czbooks.net/n/x{i}">'
+            f'<div class="novel-item-title">書名{i}</div></a></li>'
+            for i in range(results)
+        )
+        + f"</ul>{_noise(rng, 100)}</body></html>"
+    )
+
+
+def _best(func, *args) -> float:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _novel(soup: BeautifulSoup) -> list[str]:
+    return [a["href"] for a in soup.find("ul", id="chapter-list").find_all("a")]
+
+
+def _chapter(soup: BeautifulSoup) -> str:
+    return soup.find("div", class_="content").text
+
+
+def _search(soup: BeautifulSoup) -> list[str]:
+    return [
+        li.find("div", class_="novel-item-title").text
+        for li in soup.find("ul", class_="nav novel-list style-default").find_all(
+            "li", class_="novel-item-wrapper"
+        )
+    ]
+
+
+def main() -> None:
+    rng = random.Random(0)
+    pages = {
+        "novel": (novel_page(rng), _novel),
+        "chapter": (chapter_page(rng), _chapter),
+        "search": (search_page(rng), _search),
+    }
+    print(f"parser: {PARSER}, best of {RUNS}")
+    for name, (text, extract) in pages.items():
+
+        def full(text: str):
+            return extract(BeautifulSoup(text, "html.parser"))
+
+        def strained(text: str):
+            return extract(parse_html(text, name))
+
+        assert full(text) == strained(text), name
+        print(
+            f"{name:8} {len(text) / 1024:7.0f} KB"
+            f"  full html.parser {_best(full, text):7.1f} ms"
+            f"  parse_html {_best(strained, text):7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Upsert throughput of the write-behind batches, with the category ids kept in memory
+against looking each category up with `get_or_create` per novel as before.
+
+Runs against a database in a temporary directory.
+Run from the repository root: python -m benchmarks.bench_upsert
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+RUNS = 3
+NOVELS = 1000
+CATEGORIES = 20
+CHAPTERS = 50
+# the default WRITE_BEHIND_MAX_ITEMS
+BATCH = 50
+
+
+def _novel(i: int):
+    import czbook
+    from utils.czbook import Novel
+
+    info = czbook.NovelInfo(
+        id=f"n{i}",
+        title=f"書名{i}",
+        description="簡介" * 100,
+        thumbnail=None,
+        author=czbook.Author(f"作者{i % 97}"),
+        state="連載中",
+        last_update="2024-01-01",
+        views=i,
+        category=czbook.Category(
+            f"分類{i % CATEGORIES}", f"https://czbooks.net/c/{i % CATEGORIES}"
+        ),
+        hashtags=czbook.HashtagList.from_list([]),
+    )
+    chapter_list = czbook.ChapterList(
+        [czbook.ChapterInfo(f"第{j}章", f"https://czbooks.net/n/n{i}/{j}") for j in range(CHAPTERS)]
+    )
+    return Novel(info.id, info, chapter_list, word_count=1)
+
+
+def main() -> None:
+    # the database is opened under the working directory on import
+    sys.path.insert(0, os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    import bot
+
+    database = bot.DataBase()
+    rows = [database._novel_rows(_novel(i)) for i in range(NOVELS)]
+    batches = [rows[i : i + BATCH] for i in range(0, NOVELS, BATCH)]
+
+    def lookup_per_row(name: str, url: str) -> int:
+        category, _ = database.CategoryModule.get_or_create(name=name, url=url)
+        return category.id
+
+    def upsert() -> float:
+        start = time.perf_counter()
+        for batch in batches:
+            database._upsert_novels(batch)
+        return time.perf_counter() - start
+
+    # the first run inserts the rows, the timed ones replace them as the refreshes do
+    upsert()
+    results = {"get_or_create": float("inf"), "cached ids": float("inf")}
+    for _ in range(RUNS):
+        database._get_category_id = lookup_per_row
+        results["get_or_create"] = min(results["get_or_create"], upsert())
+        del database._get_category_id
+        results["cached ids"] = min(results["cached ids"], upsert())
+
+    print(
+        f"{NOVELS} novels of {CHAPTERS} chapters in {CATEGORIES} categories,"
+        f" batches of {BATCH}, best of {RUNS}"
+    )
+    for name, seconds in results.items():
+        print(f"{name:14} {seconds * 1000:8.1f} ms  {NOVELS / seconds:8.0f} novels/s")
+    database.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import asyncio
 import os
-from typing import Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
 import logging
 
 import discord
@@ -7,68 +11,495 @@ import discord
 from dotenv import load_dotenv
 
 import czbook
-from czbook.utils import is_out_of_date
+from czbook.utils import is_out_of_date, SingleFlight
 
 import db
-from utils.czbook import (
-    Novel,
-    hashtag_list_to_str,
-    hashtag_str_to_list,
-    chapter_list_to_str,
-    chapter_str_to_list,
-)
+from utils.cache import NovelCache
+from utils.czbook import Novel, hashtag_list_to_str, hashtag_str_to_list
 from utils.logger import new_logger
+from utils.scheduler import RefreshScheduler
 
 load_dotenv()
 
 
 class DataBase(db.DataBase):
-    cache: dict[str, Novel] = {}
+    cache = NovelCache(int(os.getenv("NOVEL_CACHE_MAX_SIZE", 256 * 1024 * 1024)))
+    # chapters at the end of a novel that may be revised after publishing
+    recheck_last_chapters: int = 1
+    # compress the chapter contents with a dictionary shared by the novel
+    use_content_dictionary: bool = True
+    # dictionaries of the novels used lately kept in memory, about 32KB each
+    max_content_dictionaries: int = 64
+    # coalesce concurrent lookups of the same novel
+    novel_flight = SingleFlight()
+    # seconds a cached novel stays fresh, by its state
+    freshness: dict[str, float] = {"已完結": 86400, "連載中": 3600}
+    default_freshness: float = 3600
+    # return a stale novel immediately and refresh it in the background
+    stale_while_revalidate: bool = True
+    # latency of fetching a novel that isn't cached
+    fetch_latency = db.LatencyHistogram()
+
+    def __init__(self) -> None:
+        super().__init__()
+        # novel id -> compression dictionary, used by the reader and writer threads
+        self.content_dictionaries: OrderedDict[str, bytes] = OrderedDict()
+        self._content_dictionaries_lock = threading.Lock()
+        # (name, url) -> id, kept up to date by the writer thread
+        self.category_ids: dict[tuple[str, str], int] = {
+            (category.name, category.url): category.id for category in self.CategoryModule.select()
+        }
+        self.write_queue = db.WriteBehindQueue(
+            self._flush_novels,
+            int(os.getenv("WRITE_BEHIND_INTERVAL_MS", 500)) / 1000,
+            int(os.getenv("WRITE_BEHIND_MAX_ITEMS", 50)),
+        )
+        # called with the novel and its changes when a refresh updated it
+        self.refresh_listeners: list[Callable[[Novel, czbook.NovelChanges], Awaitable[None]]] = []
+        self._background_tasks: set[asyncio.Task] = set()
+        self.refresh_scheduler = RefreshScheduler(
+            self,
+            budget=int(os.getenv("REFRESH_BUDGET_PER_HOUR", 60)),
+            tick=float(os.getenv("REFRESH_TICK_SECONDS", 60)),
+        )
 
     # czbook function #
-    def add_or_update_cache(self, novel: Novel) -> None:
+    async def add_or_update_cache(self, novel: Novel) -> None:
         # cache
         self.cache[novel.id] = novel
 
-        # database
-        category, _ = self.CategoryModule.get_or_create(
-            name=novel.category.name, url=novel.category.url
+        # database, written behind in batches
+        self.write_queue.put(novel.id, novel)
+
+    async def _flush_novels(self, novels: list[Novel]) -> None:
+        # the rows are built in the event loop, so the novels aren't read by other threads
+        await self.executor.write(
+            "upsert_novels", self._upsert_novels, [self._novel_rows(novel) for novel in novels]
+        )
+
+    def _novel_rows(self, novel: Novel) -> tuple[dict, tuple[str, str], list[dict]]:
+        return (
+            {
+                "novel_id": novel.id,
+                "titel": novel.title,
+                "description": novel.description,
+                "thumbnail": novel.thumbnail and novel.thumbnail.to_dict(),
+                "author": novel.author.name,
+                "state": novel.state,
+                "last_update": novel.last_update,
+                "views": novel.views,
+                "hashtags": hashtag_list_to_str(novel.hashtags),
+                "word_count": novel.word_count,
+            },
+            (novel.category.name, novel.category.url),
+            [
+                {"novel_id": novel.id, "index": index, "name": chapter.name, "url": chapter.url}
+                for index, chapter in enumerate(novel.chapter_list)
+            ],
         )
-        self.NovelModule.insert(
-            novel_id=novel.id,
-            titel=novel.title,
-            description=novel.description,
-            thumbnail=novel.thumbnail and novel.thumbnail.to_dict(),
-            author=novel.author.name,
-            state=novel.state,
-            last_update=novel.last_update,
-            views=novel.views,
-            category=category,
-            hashtags=hashtag_list_to_str(novel.hashtags),
-            chapter_list=chapter_list_to_str(novel.chapter_list),
-            word_count=novel.word_count,
-        ).on_conflict("replace").execute()
-
-    def get_cache(self, id: str) -> Novel | None:
-        if novel := self.cache.get(id):
+
+    def _upsert_novels(self, rows: list[tuple[dict, tuple[str, str], list[dict]]]) -> None:
+        """
+        Replace the persisted novels and their chapter lists in one transaction,
+        the contents are saved separately.
+        """
+        try:
+            with self.database.atomic():
+                for novel_row, category, chapter_rows in rows:
+                    self.NovelModule.insert(
+                        **novel_row, category=self._get_category_id(*category)
+                    ).on_conflict("replace").execute()
+                    self.ChapterModule.delete().where(
+                        self.ChapterModule.novel_id == novel_row["novel_id"]
+                    ).execute()
+                    for batch in db.chunked(chapter_rows, 500):
+                        self.ChapterModule.insert_many(batch).execute()
+        except Exception:
+            # the category ids inserted by the rolled back transaction are invalid
+            self.category_ids.clear()
+            raise
+
+    def _get_category_id(self, name: str, url: str) -> int:
+        """
+        Get the id of the category from the memory, insert it if it's unknown.
+        """
+        if (id := self.category_ids.get((name, url))) is None:
+            category, _ = self.CategoryModule.get_or_create(name=name, url=url)
+            id = self.category_ids[(name, url)] = category.id
+        return id
+
+    def _load_chapter_list(self, novel_id: str) -> czbook.ChapterList:
+        """
+        Load the chapter list without the contents.
+        """
+        return czbook.ChapterList(
+            [
+                czbook.ChapterInfo(chapter.name, chapter.url)
+                for chapter in self.ChapterModule.select()
+                .where(self.ChapterModule.novel_id == novel_id)
+                .order_by(self.ChapterModule.index)
+            ]
+        )
+
+    async def save_chapter_content(self, novel_id: str, chapter: czbook.ChapterInfo) -> None:
+        """
+        Persist the content of a chapter as soon as it is downloaded.
+        """
+        await self.executor.write(
+            "save_chapter_content",
+            self._save_chapter_content,
+            novel_id,
+            chapter.url,
+            chapter.content,
+            chapter.name,
+        )
+
+    def _save_chapter_content(self, novel_id: str, url: str, content: str, name: str = "") -> None:
+        with self.database.atomic():
+            self.ChapterContentModule.insert(
+                novel_id=novel_id,
+                url=url,
+                content=czbook.compress.compress(
+                    content, self._get_content_dictionary(novel_id, content)
+                ),
+            ).on_conflict("replace").execute()
+            # full-text search across the novels
+            self.ChapterSearchModule.insert(
+                {
+                    self.ChapterSearchModule.rowid: self.ChapterSearchModule.chapter_rowid(
+                        novel_id, url
+                    ),
+                    self.ChapterSearchModule.novel_id: novel_id,
+                    self.ChapterSearchModule.name: name,
+                    self.ChapterSearchModule.url: url,
+                    self.ChapterSearchModule.content: content,
+                }
+            ).on_conflict("replace").execute()
+
+    def _get_content_dictionary(self, novel_id: str, sample: str = None) -> bytes | None:
+        """
+        Get the compression dictionary of the novel,
+        it is built from the sample content if the novel doesn't have one yet.
+        """
+        with self._content_dictionaries_lock:
+            if novel_id in self.content_dictionaries:
+                self.content_dictionaries.move_to_end(novel_id)
+                return self.content_dictionaries[novel_id]
+        if data := self.ContentDictionaryModule.get_or_none(
+            self.ContentDictionaryModule.novel_id == novel_id
+        ):
+            dictionary = bytes(data.data)
+        elif self.use_content_dictionary and sample:
+            dictionary = czbook.compress.build_dictionary([sample])
+            self.ContentDictionaryModule.insert(novel_id=novel_id, data=dictionary).execute()
+        else:
+            return None
+        with self._content_dictionaries_lock:
+            self.content_dictionaries[novel_id] = dictionary
+            self.content_dictionaries.move_to_end(novel_id)
+            while len(self.content_dictionaries) > self.max_content_dictionaries:
+                self.content_dictionaries.popitem(last=False)
+        return dictionary
+
+    async def discard_chapter_contents(self, novel_id: str, urls: list[str]) -> None:
+        """
+        Remove the persisted content of the chapters which should be downloaded again.
+        """
+        await self.executor.write(
+            "discard_chapter_contents",
+            self.ChapterContentModule.delete()
+            .where(
+                (self.ChapterContentModule.novel_id == novel_id)
+                & (self.ChapterContentModule.url.in_(urls))
+            )
+            .execute,
+        )
+        await self.executor.write(
+            "discard_chapter_search",
+            self.ChapterSearchModule.delete()
+            .where(
+                self.ChapterSearchModule.rowid.in_(
+                    [self.ChapterSearchModule.chapter_rowid(novel_id, url) for url in urls]
+                )
+            )
+            .execute,
+        )
+        await self.executor.write(
+            "discard_content_index",
+            self.ContentIndexModule.delete()
+            .where(self.ContentIndexModule.novel_id == novel_id)
+            .execute,
+        )
+
+    async def load_chapter_contents(self, novel: Novel) -> int:
+        """
+        Fill the chapters without content from the persisted ones.
+        Return the number of chapters loaded.
+        """
+        missing = {
+            chapter.url: chapter for chapter in novel.chapter_list if not chapter.has_content
+        }
+        if not missing:
+            return 0
+        dictionary, contents = await self.executor.read(
+            "load_chapter_contents", self._load_chapter_contents, novel.id
+        )
+        loaded = 0
+        for url, content in contents:
+            if chapter := missing.get(url):
+                # decompressed on first access
+                chapter.set_compressed_content(content, dictionary)
+                chapter._error = None
+                loaded += 1
+        if loaded:
+            self.cache.resize(novel)
+        return loaded
+
+    def _load_chapter_contents(self, novel_id: str) -> tuple[bytes | None, list[tuple[str, bytes]]]:
+        return self._get_content_dictionary(novel_id), [
+            (data.url, bytes(data.content))
+            for data in self.ChapterContentModule.select().where(
+                self.ChapterContentModule.novel_id == novel_id
+            )
+        ]
+
+    async def build_content_index(self, novel: Novel) -> czbook.ContentIndex | None:
+        """
+        Build the content index of a novel whose chapters all have content, and persist it.
+        """
+        if not all(chapter.has_content for chapter in novel.chapter_list):
+            return None
+        novel.content_index = await asyncio.to_thread(czbook.ContentIndex.build, novel.chapter_list)
+        await self.executor.write(
+            "save_content_index", self._save_content_index, novel.id, novel.content_index
+        )
+        self.cache.resize(novel)
+        return novel.content_index
+
+    def _save_content_index(self, novel_id: str, index: czbook.ContentIndex) -> None:
+        self.ContentIndexModule.insert(novel_id=novel_id, data=index.to_bytes()).on_conflict(
+            "replace"
+        ).execute()
+
+    async def get_content_index(self, novel: Novel) -> czbook.ContentIndex | None:
+        """
+        Get the content index of the novel from the memory or the database,
+        it is built if the novel has all the contents but no index yet.
+        """
+        if novel.content_index and novel.content_index.matches(novel.chapter_list):
+            return novel.content_index
+        index = await self.executor.read("get_content_index", self._load_content_index, novel.id)
+        if index and index.matches(novel.chapter_list):
+            novel.content_index = index
+            self.cache.resize(novel)
+            return index
+        return await self.build_content_index(novel)
+
+    def _load_content_index(self, novel_id: str) -> czbook.ContentIndex | None:
+        if data := self.ContentIndexModule.get_or_none(
+            self.ContentIndexModule.novel_id == novel_id
+        ):
+            return czbook.ContentIndex.from_bytes(bytes(data.data))
+        return None
+
+    async def search_all_contents(self, keyword: str, limit: int = 20) -> list[dict]:
+        """
+        Search the content of every downloaded chapter.
+
+        Return: `list[dict]`
+            the best hits first, with the novel id and title, chapter name and url,
+            and a snippet with the keyword highlighted as `__***keyword***__`.
+        """
+        return await self.executor.read(
+            "search_all_contents", self._search_all_contents, keyword, limit
+        )
+
+    def _search_all_contents(self, keyword: str, limit: int) -> list[dict]:
+        module = self.ChapterSearchModule
+        if len(keyword) >= 3:
+            # as a phrase, so the keyword isn't parsed as a query
+            phrase = '"%s"' % keyword.replace('"', '""')
+            query = (
+                module.select(
+                    module.novel_id,
+                    module.name,
+                    module.url,
+                    module.content.snippet("__***", "***__", "⋯", 16).alias("snippet"),
+                )
+                .where(module.match(phrase))
+                .order_by(module.rank())
+            )
+        else:
+            # the trigrams can't match a shorter keyword, scan for it instead
+            position = db.fn.instr(module.content, keyword)
+            snippet = db.fn.substr(module.content, db.fn.max(position - 12, 1), len(keyword) + 24)
+            query = (
+                module.select(module.novel_id, module.name, module.url, snippet.alias("snippet"))
+                .where(position > 0)
+                .order_by(module.novel_id)
+            )
+        hits = list(query.limit(limit).dicts())
+        for hit in hits:
+            hit["snippet"] = "".join(hit["snippet"].split())
+            if len(keyword) < 3:
+                hit["snippet"] = hit["snippet"].replace(keyword, f"__***{keyword}***__")
+            hit["snippet"] = self._trim_snippet(hit["snippet"], keyword)
+
+        titles = dict(
+            self.NovelModule.select(self.NovelModule.novel_id, self.NovelModule.titel)
+            .where(self.NovelModule.novel_id.in_({hit["novel_id"] for hit in hits}))
+            .tuples()
+        )
+        for hit in hits:
+            hit["title"] = titles.get(hit["novel_id"], hit["novel_id"])
+        return hits
+
+    @staticmethod
+    def _trim_snippet(snippet: str, keyword: str, context: int = 16) -> str:
+        """
+        Keep the first highlight, as long as the keyword, with `context` characters around it.
+        The trigram tokenizer highlights a run of repeated characters whole, however long it is.
+        """
+        start = snippet.find("__***")
+        if start == -1 or (end := snippet.find("***__", start)) == -1:
+            return snippet[: len(keyword) + 2 * context]
+        before = snippet[:start]
+        highlighted = snippet[start + 5 : end]
+        after = highlighted[len(keyword) :] + snippet[end + 5 :]
+        after = after.replace("__***", "").replace("***__", "")
+        return (
+            ("⋯" if len(before) > context else "")
+            + before[-context:]
+            + f"__***{highlighted[:len(keyword)]}***__"
+            + after[:context]
+            + ("⋯" if len(after) > context else "")
+        )
+
+    async def get_cache(self, id: str) -> Novel | None:
+        if novel := self.cache.get(id) or self.write_queue.pending.get(id):
+            return novel
+        if novel := await self.executor.read("get_novel", self._load_novel, id):
+            self.cache[id] = novel
+            self.get_theme_colors_in_background(novel)
             return novel
+
+        return None
+
+    def _load_novel(self, id: str) -> Novel | None:
         if data := self.NovelModule.get_or_none(self.NovelModule.novel_id == id):
             return self._db_data_to_novel_class(data)
-
         return None
 
     async def fetch_novel(self, id: str, first: bool = True) -> Novel:
-        return Novel.from_original_novel(await czbook.fetch_novel(id, first))
+        start = time.perf_counter()
+        novel = Novel.from_original_novel(await czbook.fetch_novel(id, first))
+        self.fetch_latency.observe((time.perf_counter() - start) * 1000)
+        self.get_theme_colors_in_background(novel)
+        return novel
+
+    def get_theme_colors_in_background(self, novel: Novel) -> None:
+        """
+        Get the theme colors of the novel thumbnail if they are missing,
+        then update the cached embeds and the messages showing them.
+        """
+        if novel.thumbnail and not novel.thumbnail.has_theme_color:
+            self._run_in_background(self._get_theme_colors(novel))
+
+    async def _get_theme_colors(self, novel: Novel) -> None:
+        thumbnail = novel.thumbnail
+        try:
+            await thumbnail.get_theme_colors()
+        except Exception as e:
+            print(f"Error when getting the theme colors of {novel.id}: {e}")
+            return
+        if thumbnail is not novel.thumbnail:
+            # replaced by a refresh meanwhile
+            return
+        for embed in (novel._overview_embed_cache, novel._chapter_embed_cache):
+            if embed:
+                embed.color = novel.get_theme_color()
+        await self.add_or_update_cache(novel)
+        changes = czbook.NovelChanges({"theme_color"})
+        for listener in self.refresh_listeners:
+            try:
+                await listener(novel, changes)
+            except Exception as e:
+                print(f"Error in refresh listener for {novel.id}: {e}")
 
     async def get_or_fetch_novel(self, id: str, update_when_out_of_date: bool = True) -> Novel:
-        if novel := self.get_cache(id):
-            if update_when_out_of_date and is_out_of_date(novel.last_fetch_time, 3600):
-                await novel.update()
-                self.add_or_update_cache(novel)
+        self.refresh_scheduler.record_request(id)
+        return await self.novel_flight.do(id, self._get_or_fetch_novel, id, update_when_out_of_date)
+
+    async def _get_or_fetch_novel(self, id: str, update_when_out_of_date: bool) -> Novel:
+        if novel := await self.get_cache(id):
+            if update_when_out_of_date and self.is_stale(novel):
+                if self.stale_while_revalidate:
+                    self._run_in_background(self._refresh_in_background(novel))
+                else:
+                    await self.refresh_novel(novel)
             return novel
-        self.add_or_update_cache(novel := await self.fetch_novel(id))
+        await self.add_or_update_cache(novel := await self.fetch_novel(id))
         return novel
 
+    def is_stale_after(self, novel: Novel) -> float:
+        return self.freshness.get(novel.state, self.default_freshness)
+
+    def is_stale(self, novel: Novel) -> bool:
+        return bool(is_out_of_date(novel.last_fetch_time, self.is_stale_after(novel)))
+
+    async def refresh_novel(self, novel: Novel) -> czbook.NovelChanges:
+        """
+        Refresh the novel from the website, concurrent refreshes of a novel are coalesced.
+        Return the changes, which are falsy if nothing changed.
+        """
+        return await self.novel_flight.do(("refresh", novel.id), self._refresh_novel, novel)
+
+    async def _refresh_novel(self, novel: Novel) -> czbook.NovelChanges:
+        if not (
+            changes := await novel.update(self.recheck_last_chapters, self.load_chapter_contents)
+        ):
+            # nothing to render or write again
+            return changes
+
+        if changes.rechecked_chapters or changes.removed_chapters:
+            await self.discard_chapter_contents(
+                novel.id,
+                [chapter.url for chapter in changes.rechecked_chapters + changes.removed_chapters],
+            )
+        novel._overview_embed_cache = None
+        if "chapter_list" in changes.fields:
+            novel._chapter_embed_cache = None
+        if "thumbnail" in changes.fields:
+            self.get_theme_colors_in_background(novel)
+        await self.add_or_update_cache(novel)
+        for listener in self.refresh_listeners:
+            try:
+                await listener(novel, changes)
+            except Exception as e:
+                print(f"Error in refresh listener for {novel.id}: {e}")
+        return changes
+
+    def _run_in_background(self, coro: Awaitable[None]) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def cancel_background_tasks(self) -> None:
+        """
+        Cancel the background refreshes and theme color extractions, and wait for them to end.
+        """
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        # the refreshes are shielded from their callers
+        await self.novel_flight.cancel()
+
+    async def _refresh_in_background(self, novel: Novel) -> None:
+        try:
+            await self.refresh_novel(novel)
+        except Exception as e:
+            print(f"Error when refreshing {novel.id}: {e}")
+
     def _db_data_to_novel_class(self, data: db.NovelType) -> Novel:
         return Novel(
             id=data.novel_id,
@@ -84,7 +515,7 @@ class DataBase(db.DataBase):
                 category=czbook.Category(data.category.name, data.category.url),
                 hashtags=hashtag_str_to_list(data.hashtags),
             ),
-            chapter_list=chapter_str_to_list(data.chapter_list),
+            chapter_list=self._load_chapter_list(data.novel_id),
             comment=czbook.CommentList(data.novel_id),
             word_count=data.word_count,
         )
@@ -95,6 +526,7 @@ class Bot(discord.Bot):
         super().__init__(description, *args, **options)
         self.get_content_msg: set = set()
         self.db = DataBase()
+        czbook.set_parser_workers(int(os.getenv("PARSER_WORKERS", 0)))
         self._logger = new_logger("bot", level="DEBUG")
 
         for k, v in self.load_extension("cogs", recursive=True, store=True).items():
@@ -113,6 +545,7 @@ class Bot(discord.Bot):
         The event that is triggered when the bot is ready.
         """
         print(f"Login as {self.user} ({self.user.id}).")
+        self.db.refresh_scheduler.start()
 
     async def close(self) -> None:
         """
@@ -120,6 +553,28 @@ class Bot(discord.Bot):
         """
         print("Closing the bot...")
         await super().close()
+        await self.db.refresh_scheduler.stop()
+        # before the queue and the executor they write to are closed
+        await self.db.cancel_background_tasks()
+        self.logger.debug(f"Refresh scheduler: {self.db.refresh_scheduler.stats}")
+        self.logger.debug(f"HTTP client stats: {czbook.http_client.stats}")
+        self.logger.debug(f"Rate limiter: {czbook.rate_limiter.rates}")
+        self.logger.debug(f"HTTP cache stats: {czbook.http_cache.stats}")
+        self.logger.debug(f"Coalesced url fetches: {czbook.http.url_flight.stats}")
+        self.logger.debug(f"Coalesced novel lookups: {self.db.novel_flight.stats}")
+        self.logger.debug(f"Content compression: {czbook.compression_stats.to_dict()}")
+        self.logger.debug(f"Theme colors: {czbook.theme_color_stats.to_dict()}")
+        self.logger.debug(f"Thumbnail cache stats: {czbook.thumbnail_cache.stats}")
+        self.logger.debug(f"Theme color cache stats: {czbook.theme_color_cache.stats}")
+        self.logger.debug(f"Novel fetch latency: {self.db.fetch_latency.to_dict()}")
+        self.logger.debug(f"Novel cache stats: {self.db.cache.stats}")
+        await self.db.write_queue.close()
+        self.logger.debug(f"Write-behind queue: {self.db.write_queue.stats}")
+        self.db.executor.shutdown()
+        self.logger.debug(f"Database latency: {self.db.executor.stats}")
+        await czbook.theme_color_cache.close()
+        await czbook.http.close()
+        czbook.shutdown_parser()
         print("Bot is offline.")
 
     def run(self, token: str) -> None:
@@ -1,4 +1,7 @@
 import asyncio
+import functools
+import time
+from collections import OrderedDict
 
 import discord
 
@@ -7,12 +10,69 @@ from discord.ui import View, Button
 
 import czbook
 from bot import BaseCog, Bot
+from utils.czbook import Novel
 from utils.discord import get_or_fetch_message_from_reference, context_info
 
+# max messages per novel and in total to patch after a background refresh
+OVERVIEW_MESSAGES_PER_NOVEL = 20
+OVERVIEW_MESSAGES_MAX = 500
+# interaction responses can only be edited within 15 minutes
+OVERVIEW_MESSAGE_LIFETIME = 15 * 60
+
 
 class InfoCog(BaseCog):
     def __init__(self, bot: Bot) -> None:
         super().__init__(bot)
+        # messages currently showing a novel's overview, by novel id
+        self.overview_messages: dict[str, OrderedDict[int, discord.Message]] = {}
+        # novel id and tracked time by message id, oldest first
+        self._overview_order: OrderedDict[int, tuple[str, float]] = OrderedDict()
+        self.bot.db.refresh_listeners.append(self.on_novel_refreshed)
+
+    def cog_unload(self):
+        if self.on_novel_refreshed in self.bot.db.refresh_listeners:
+            self.bot.db.refresh_listeners.remove(self.on_novel_refreshed)
+
+    def track_overview(self, novel_id: str, message: discord.Message) -> None:
+        # a message may switch to another novel
+        self._untrack(message.id)
+        messages = self.overview_messages.setdefault(novel_id, OrderedDict())
+        messages[message.id] = message
+        self._overview_order[message.id] = (novel_id, time.monotonic())
+        if len(messages) > OVERVIEW_MESSAGES_PER_NOVEL:
+            self._untrack(next(iter(messages)))
+        self._drop_overviews()
+
+    def untrack_overview(self, novel_id: str, message: discord.Message) -> None:
+        self._untrack(message.id)
+
+    def _untrack(self, message_id: int) -> None:
+        if (tracked := self._overview_order.pop(message_id, None)) is None:
+            return
+        messages = self.overview_messages[tracked[0]]
+        del messages[message_id]
+        if not messages:
+            del self.overview_messages[tracked[0]]
+
+    def _drop_overviews(self) -> None:
+        """Drop the messages which can't be edited anymore and the oldest ones over the cap."""
+        expire = time.monotonic() - OVERVIEW_MESSAGE_LIFETIME
+        for message_id, (_, tracked_time) in list(self._overview_order.items()):
+            if tracked_time > expire and len(self._overview_order) <= OVERVIEW_MESSAGES_MAX:
+                break
+            self._untrack(message_id)
+
+    async def on_novel_refreshed(self, novel: Novel, changes: czbook.NovelChanges):
+        """Patch the overview messages of a novel updated by a background refresh."""
+        self._drop_overviews()
+        if not (messages := self.overview_messages.get(novel.id)):
+            return
+        embed = novel.overview_embed()
+        for message in list(messages.values()):
+            try:
+                await message.edit(embed=embed)
+            except discord.HTTPException:
+                self.untrack_overview(novel.id, message)
 
     @discord.slash_command(
         guild_only=True,
@@ -29,10 +89,13 @@ class InfoCog(BaseCog):
         code = czbook.utils.get_code(link) or link
         try:
             novel = await self.bot.db.get_or_fetch_novel(code)
-            await ctx.respond(
+            message = await ctx.respond(
                 embed=novel.overview_embed(),
                 view=InfoView(self.bot),
             )
+            if isinstance(message, Interaction):
+                message = await message.original_response()
+            self.track_overview(novel.id, message)
         except czbook.NotFoundError:
             await ctx.respond(
                 embed=Embed(title="未知的書本", color=discord.Color.red()),
@@ -96,6 +159,10 @@ class InfoView(View):
         cancel_get_content_button.callback = self.cancel_get_content
         self.cancel_get_content_view = View(cancel_get_content_button, timeout=None)
 
+    @property
+    def cog(self) -> "InfoCog":
+        return self.bot.get_cog("InfoCog")
+
     async def overview_button_callback(self, interaction: Interaction):
         self.overview_button.disabled = True
         self.chapter_button.disabled = False
@@ -106,6 +173,7 @@ class InfoView(View):
             czbook.utils.get_code(interaction.message.embeds[0].url)
         )
         await interaction.message.edit(embed=novel.overview_embed(), view=self)
+        self.cog.track_overview(novel.id, interaction.message)
 
     async def chapter_button_callback(self, interaction: Interaction):
         self.overview_button.disabled = False
@@ -117,6 +185,7 @@ class InfoView(View):
             czbook.utils.get_code(interaction.message.embeds[0].url)
         )
         await interaction.message.edit(embed=novel.chapter_embed(), view=self)
+        self.cog.untrack_overview(novel.id, interaction.message)
 
     async def comment_button_callback(self, interaction: Interaction):
         self.overview_button.disabled = False
@@ -128,6 +197,7 @@ class InfoView(View):
             czbook.utils.get_code(interaction.message.embeds[0].url)
         )
         await interaction.message.edit(embed=await novel.comment_embed(), view=self)
+        self.cog.untrack_overview(novel.id, interaction.message)
 
     async def get_content_button_callback(self, interaction: Interaction):
         self.get_content_button.disabled = interaction.message.components[-1].children[0].disabled
@@ -138,10 +208,14 @@ class InfoView(View):
         )
 
         if novel.content_cache:
-            return await interaction.followup.send(
+            await self.bot.db.load_chapter_contents(novel)
+            await interaction.followup.send(
                 content=f"- 書名: {novel.title}\n- 總字數: `{novel.word_count}`字",
                 file=discord.File(novel.filelike_content, filename=f"{novel.id}.txt"),
             )
+            # the contents were decompressed to be exported
+            self.bot.db.cache.resize(novel)
+            return
 
         self.bot.logger.info(f"{context_info(interaction)}: get content of {novel.title}")
         msg = await interaction.message.reply(
@@ -151,7 +225,11 @@ class InfoView(View):
             ),
             view=self.cancel_get_content_view,
         )
-        stats = novel.get_content()
+        # resume from the chapters persisted by an interrupted download
+        await self.bot.db.load_chapter_contents(novel)
+        stats = novel.get_content(
+            on_chapter=functools.partial(self.bot.db.save_chapter_content, novel.id)
+        )
         self.bot.get_content_msg.add(msg.id)
         while True:
             await asyncio.sleep(1)
@@ -171,13 +249,16 @@ class InfoView(View):
                 ),
                 view=None if stats.eta < 2 else MISSING,
             )
-        self.bot.db.add_or_update_cache(novel)
+        await self.bot.db.add_or_update_cache(novel)
         await msg.edit(
             content=f"- 書名: {novel.title}\n- 總字數: `{novel.word_count}`字",
             file=discord.File(novel.filelike_content, filename=f"{novel.id}.txt"),
             embed=None,
             view=None,
         )
+        self.bot.db.cache.resize(novel)
+        # for the content searches
+        await self.bot.db.build_content_index(novel)
 
     async def cancel_get_content(self, interaction: Interaction):
         message = await get_or_fetch_message_from_reference(interaction.message)
@@ -137,22 +137,45 @@ class SearchCog(BaseCog):
         str,
         description="欲搜尋的關鍵字",
     )
+    @discord.option(
+        "advanced",
+        bool,
+        description="使用進階語法: 空白=且, |=或, -關鍵字=排除, A NEAR/50 B=相距50字內",
+        default=False,
+    )
     async def content(
         self,
         ctx: ApplicationContext,
         link: str,
         keyword: str,
+        advanced: bool,
     ):
         await ctx.defer()
 
         try:
             novel = await self.bot.db.get_or_fetch_novel(czbook.utils.get_code(link) or link)
-            results = czbook.search_content(novel.chapter_list, keyword, context_length=8)
+            await self.bot.db.load_chapter_contents(novel)
+            if advanced:
+                results = czbook.search_content_query(novel.chapter_list, keyword, context_length=8)
+            else:
+                results = czbook.search_content(
+                    novel.chapter_list,
+                    keyword,
+                    context_length=8,
+                    index=await self.bot.db.get_content_index(novel),
+                )
         except czbook.NotFoundError:
             return await ctx.respond(embed=Embed(title="未知的書本", color=discord.Color.red()))
         except czbook.ChapterNoContentError:
-            return await ctx.respond(embed=Embed(title="該書尚未取得內文", color=discord.Color.red()))
+            return await ctx.respond(
+                embed=Embed(title="該書尚未取得內文", color=discord.Color.red())
+            )
+        except czbook.InvalidQueryError as e:
+            return await ctx.respond(
+                embed=Embed(title="搜尋語法錯誤", description=str(e), color=discord.Color.red())
+            )
         if not results:
+            self.bot.db.cache.resize(novel)
             return await ctx.respond(embed=Embed(title="無搜尋結果", color=discord.Color.red()))
 
         embed = Embed(title=f"{novel.title}搜尋結果", url=f"https://czbooks.net/n/{novel.id}")
@@ -166,9 +189,54 @@ class SearchCog(BaseCog):
                 embed.remove_field(-1)
                 break
         embed.set_footer(text=f"已顯示{len(embed.fields)}/共{len(results)}筆結果")
+        # the contents were decompressed to be searched and shown
+        self.bot.db.cache.resize(novel)
+
+        await ctx.respond(embed=embed)
+
+    @search_group.command(
+        guild_only=True,
+        name="all_content",
+        description="搜尋所有已擷取內文的書本",
+    )
+    @discord.option(
+        "keyword",
+        str,
+        description="欲搜尋的關鍵字",
+    )
+    async def all_content(
+        self,
+        ctx: ApplicationContext,
+        keyword: str,
+    ):
+        await ctx.defer()
+
+        if not (results := await self.bot.db.search_all_contents(keyword)):
+            return await ctx.respond(embed=Embed(title="無搜尋結果", color=discord.Color.red()))
+
+        embed = Embed(title="內文搜尋結果")
+        for result in results:
+            # a field value is at most 1024 characters
+            snippet = result["snippet"][: 1020 - len(result["url"])]
+            embed.add_field(
+                name=f"{result['title']} {result['name']}"[:256],
+                value=f"[{snippet}]({result['url']})"[:1024],
+                inline=False,
+            )
+            if len(embed) > 6000:
+                embed.remove_field(-1)
+                break
+        embed.set_footer(text=f"已顯示{len(embed.fields)}筆結果")
 
         await ctx.respond(embed=embed)
 
+    @all_content.error
+    async def on_all_content_error(self, ctx: ApplicationContext, error):
+        await ctx.respond(
+            embed=Embed(title="發生未知的錯誤", color=discord.Color.red()),
+            ephemeral=True,
+        )
+
     @discord.Cog.listener()
     async def on_ready(self):
         self.bot.add_view(SearchView(self.bot))
@@ -201,10 +269,12 @@ class SearchView(View):
         await interaction.response.defer()
 
         novel = await self.bot.db.get_or_fetch_novel(code)
-        await interaction.followup.send(
+        message = await interaction.followup.send(
             embed=novel.overview_embed(),
             view=InfoView(self.bot),
         )
+        if cog := self.bot.get_cog("InfoCog"):
+            cog.track_overview(novel.id, message)
 
 
 def setup(bot: Bot):
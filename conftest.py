@@ -0,0 +1 @@
+# makes pytest put the repository root on sys.path, so the tests import the packages
@@ -16,7 +16,14 @@ from .novel_info.hashtag import Hashtag, HashtagList
 from .chapter import ChapterInfo, ChapterList
 from .comment import Comment, CommentList
 from .content import GetContentState, GetContent, ContentSearchResult, search_content
-from .czbook import Novel, fetch_novel
+from .index import ContentIndex
+from .query import ContentQuery, search_content_query
+from .czbook import Novel, NovelChanges, fetch_novel
 from .error import *
-from .http import HyperLink
+from .cache import HttpCache, ThemeColorCache, http_cache, thumbnail_cache, theme_color_cache
+from .color import theme_color_stats
+from .compress import compression_stats
+from .http import HyperLink, HttpClient, http_client
+from .parser import parse_html, set_parser_workers, shutdown_parser
+from .ratelimit import RateLimiter, rate_limiter
 from .search import SearchResult, search, search_advance
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import zlib
+
+from collections import OrderedDict
+
+from .const import (
+    HTTP_CACHE_PATH,
+    HTTP_CACHE_MAX_SIZE,
+    THUMBNAIL_CACHE_PATH,
+    THUMBNAIL_CACHE_MAX_SIZE,
+    THEME_COLOR_CACHE_PATH,
+    THEME_COLOR_CACHE_MAX_ENTRIES,
+    THEME_COLOR_CACHE_SAVE_DELAY,
+)
+
+
+class CacheEntry:
+    def __init__(
+        self, url: str, content: str | bytes, etag: str = None, last_modified: str = None
+    ) -> None:
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def text(self) -> str:
+        return self.content if isinstance(self.content, str) else self.content.decode()
+
+    @property
+    def validators(self) -> dict[str, str]:
+        """
+        The headers for a conditional request.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    On-disk response cache with size-bounded LRU eviction.
+
+    Each entry is one file: a JSON line with the validators followed by the body,
+    zlib compressed if `compress` (already compressed bodies like images don't gain from it).
+    The files are read and written in a thread, off the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str = HTTP_CACHE_PATH,
+        max_size: int = HTTP_CACHE_MAX_SIZE,
+        compress: bool = True,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.max_size = max_size
+        self.compress = compress
+        self._index: OrderedDict[str, int] = None
+        self._size = 0
+        # the index is shared by the threads of the executor
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "entries": len(self._index or ()),
+            "size": self._size,
+        }
+
+    @property
+    def index(self) -> OrderedDict[str, int]:
+        if self._index is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            files = sorted(self.path.glob("*.cache"), key=lambda file: file.stat().st_mtime)
+            self._index = OrderedDict((file.stem, file.stat().st_size) for file in files)
+            self._size = sum(self._index.values())
+        return self._index
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _file(self, key: str) -> pathlib.Path:
+        return self.path / f"{key}.cache"
+
+    async def get(self, url: str) -> CacheEntry | None:
+        return await asyncio.to_thread(self._get, url)
+
+    async def put(self, entry: CacheEntry) -> None:
+        await asyncio.to_thread(self._put, entry)
+
+    def _get(self, url: str) -> CacheEntry | None:
+        with self._lock:
+            if (key := self._key(url)) not in self.index:
+                return None
+            try:
+                meta, body = self._file(key).read_bytes().split(b"\n", 1)
+                meta = json.loads(meta)
+                if meta.get("compressed", True):
+                    body = zlib.decompress(body)
+                content = body if meta.get("binary") else body.decode()
+            except (OSError, ValueError, zlib.error):
+                self._remove(key)
+                return None
+
+            self.index.move_to_end(key)
+            os.utime(self._file(key))
+            return CacheEntry(url, content, meta.get("etag"), meta.get("last_modified"))
+
+    def _put(self, entry: CacheEntry) -> None:
+        with self._lock:
+            if not entry.etag and not entry.last_modified:
+                return
+            key = self._key(entry.url)
+            binary = isinstance(entry.content, bytes)
+            body = entry.content if binary else entry.content.encode()
+            data = (
+                json.dumps(
+                    {
+                        "url": entry.url,
+                        "etag": entry.etag,
+                        "last_modified": entry.last_modified,
+                        "binary": binary,
+                        "compressed": self.compress,
+                    }
+                ).encode()
+                + b"\n"
+                + (zlib.compress(body) if self.compress else body)
+            )
+            self._remove(key)
+            self._file(key).write_bytes(data)
+            self.index[key] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _remove(self, key: str) -> None:
+        if (size := self.index.pop(key, None)) is not None:
+            self._size -= size
+        self._file(key).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self._size > self.max_size and len(self.index) > 1:
+            self._remove(next(iter(self.index)))
+
+
+class ThemeColorCache:
+    """
+    Persistent LRU cache of the theme colors of images, keyed by the hash of the image content,
+    so the same cover art is never quantized twice.
+
+    New colors are saved together `save_delay` seconds after the first of them, in a thread.
+    """
+
+    def __init__(
+        self,
+        path: str = THEME_COLOR_CACHE_PATH,
+        max_entries: int = THEME_COLOR_CACHE_MAX_ENTRIES,
+        save_delay: float = THEME_COLOR_CACHE_SAVE_DELAY,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._colors: OrderedDict[str, list[int]] = None
+        self._dirty = False
+        self._save_task: asyncio.Task = None
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.colors)}
+
+    @property
+    def colors(self) -> OrderedDict[str, list[int]]:
+        if self._colors is None:
+            try:
+                self._colors = OrderedDict(json.loads(self.path.read_text()))
+            except (OSError, ValueError):
+                self._colors = OrderedDict()
+        return self._colors
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    def get(self, key: str) -> list[int] | None:
+        if (colors := self.colors.get(key)) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.colors.move_to_end(key)
+        return colors
+
+    def put(self, key: str, colors: list[int]) -> None:
+        self.colors[key] = colors
+        self.colors.move_to_end(key)
+        while len(self.colors) > self.max_entries:
+            self.colors.popitem(last=False)
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            try:
+                self._save_task = asyncio.get_running_loop().create_task(self._save_later())
+            except RuntimeError:
+                # no event loop, save right away
+                self._save(list(self.colors.items()))
+                self._dirty = False
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(self.save_delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Save the new colors now, in a thread.
+        """
+        if not self._dirty:
+            return
+        self._dirty = False
+        # a snapshot, the colors may change while they are written
+        items = list(self.colors.items())
+        await asyncio.get_running_loop().run_in_executor(None, self._save, items)
+
+    async def close(self) -> None:
+        if self._save_task and not self._save_task.done():
+            self._save_task.cancel()
+        await self.flush()
+
+    def _save(self, items: list[tuple[str, list[int]]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".tmp")
+        try:
+            temp.write_text(json.dumps(items))
+            temp.replace(self.path)
+        except OSError as e:
+            print(f"Error when saving the theme color cache: {e}")
+
+
+http_cache = HttpCache()
+thumbnail_cache = HttpCache(THUMBNAIL_CACHE_PATH, THUMBNAIL_CACHE_MAX_SIZE, compress=False)
+theme_color_cache = ThemeColorCache()
@@ -1,5 +1,7 @@
 import re
+import sys
 
+from .compress import decompress
 from .const import RE_CHINESE_CHARS
 
 
@@ -7,14 +9,43 @@ class ChapterInfo:
     def __init__(self, name: str, url: str, content: str = None) -> None:
         self.name = name
         self.url = url
-        self.content = content
+        self._content = content
+        self._compressed: bytes = None
+        self._dictionary: bytes = None
         self._error: str = None
         self._word_count: int = None
         self._maybe_not_content: bool = None
 
+    @property
+    def content(self) -> str | None:
+        """
+        The content of the chapter, compressed content is decompressed on first access.
+        """
+        if self._compressed is not None:
+            self._content = decompress(self._compressed, self._dictionary)
+            self._compressed = self._dictionary = None
+        return self._content
+
+    @content.setter
+    def content(self, value: str | None) -> None:
+        self._content = value
+        self._compressed = self._dictionary = None
+
+    @property
+    def has_content(self) -> bool:
+        """
+        Whether the chapter has content, without decompressing it.
+        """
+        return self._content is not None or self._compressed is not None
+
+    def set_compressed_content(self, data: bytes, dictionary: bytes = None) -> None:
+        self._content = None
+        self._compressed = data
+        self._dictionary = dictionary
+
     @property
     def word_count(self) -> int:
-        if self.content is None:
+        if not self.has_content:
             return 0
         if self._word_count is None:
             self._word_count = len(re.findall(RE_CHINESE_CHARS, self.content))
@@ -26,6 +57,24 @@ class ChapterInfo:
             self._maybe_not_content = self.word_count < 1024
         return self._maybe_not_content
 
+    @property
+    def estimated_size(self) -> int:
+        """
+        Rough memory usage in bytes, dominated by the content.
+        """
+        return (
+            sys.getsizeof(self.name)
+            + sys.getsizeof(self.url)
+            + (sys.getsizeof(self._content) if self._content is not None else 0)
+            + (sys.getsizeof(self._compressed) if self._compressed is not None else 0)
+        )
+
+    def clear_content(self) -> None:
+        self.content = None
+        self._error = None
+        self._word_count = None
+        self._maybe_not_content = None
+
     def to_dict(self) -> dict:
         return {
             "name": self.name,
@@ -64,6 +113,21 @@ class ChapterList(list[ChapterInfo]):
     def maybe_content_count(self) -> int:
         return self._maybe_content_count or self.total_chapter_count
 
+    def merge(self, other: "ChapterList") -> "ChapterList":
+        """
+        Merge a freshly fetched chapter list into this one by url.
+        Chapters already known are kept with their content, only the new ones are added.
+        """
+        known = {chapter.url: chapter for chapter in self}
+        merged = []
+        for chapter in other:
+            if (old := known.get(chapter.url)) is not None:
+                old.name = chapter.name
+                chapter = old
+            merged.append(chapter)
+
+        return type(self)(merged)
+
     @classmethod
     def from_json(cls: type["ChapterList"], data: list[dict]) -> "ChapterList":
         """
@@ -1,10 +1,42 @@
+import asyncio
 import io
+import time
 
-import aiohttp
 import numpy as np
 
 from PIL import Image
-from sklearn.cluster import KMeans
+
+from .cache import theme_color_cache, thumbnail_cache
+from .http import fetch_cached
+
+# the image is downscaled to fit this size before quantizing
+QUANTIZE_SIZE = (64, 64)
+# bits kept of each channel when binning the pixels
+HISTOGRAM_BITS = 5
+KMEANS_MAX_ITER = 30
+
+
+class ThemeColorStats:
+    def __init__(self) -> None:
+        self.downloads = 0
+        self.download_time = 0.0
+        self.extractions = 0
+        self.extract_time = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "downloads": self.downloads,
+            "average_download_ms": (
+                self.download_time / self.downloads * 1000 if self.downloads else 0
+            ),
+            "extractions": self.extractions,
+            "average_extract_ms": (
+                self.extract_time / self.extractions * 1000 if self.extractions else 0
+            ),
+        }
+
+
+theme_color_stats = ThemeColorStats()
 
 
 def rgb_to_hex(rgb: tuple[int, int, int]) -> int:
@@ -17,16 +49,68 @@ def brightness(rgba: tuple[int, int, int, int]) -> float:
     return (0.299 * r + 0.587 * g + 0.114 * b) * a / 65025
 
 
+def _color_histogram(pixels: np.ndarray, bits: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bin the RGBA pixels, return the mean color and the pixel count of each non-empty bin.
+    """
+    binned = (pixels >> (8 - bits)).astype(np.int64)
+    keys = (binned[:, 0] << 3 * bits) | (binned[:, 1] << 2 * bits) | (binned[:, 2] << bits)
+    keys |= binned[:, 3]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    colors = np.stack(
+        [np.bincount(inverse, weights=pixels[:, channel]) for channel in range(4)], axis=1
+    )
+    return colors / counts[:, None], counts.astype(np.float64)
+
+
+def _weighted_k_means(
+    points: np.ndarray, weights: np.ndarray, k: int, max_iter: int = KMEANS_MAX_ITER
+) -> np.ndarray:
+    """
+    Lloyd's k-means over weighted points with k-means++ seeding, return the centers.
+    """
+    if len(points) <= k:
+        return points
+    rng = np.random.default_rng(0)
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[rng.choice(len(points), p=weights / weights.sum())]
+    distances = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        probabilities = weights * distances
+        centers[i] = points[rng.choice(len(points), p=probabilities / probabilities.sum())]
+        distances = np.minimum(distances, ((points - centers[i]) ** 2).sum(axis=1))
+
+    for _ in range(max_iter):
+        labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=k)
+        sums = np.stack(
+            [
+                np.bincount(labels, weights=weights * points[:, dim], minlength=k)
+                for dim in range(4)
+            ],
+            axis=1,
+        )
+        # an empty cluster keeps its center
+        new_centers = np.where(totals[:, None] > 0, sums / np.maximum(totals, 1)[:, None], centers)
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+    return centers
+
+
 def extract_theme_colors(
     image: Image.Image,
     num_colors=10,
 ) -> list[tuple[int, int, int, int]]:
-    image_array = np.array(image.convert("RGBA"))
+    """
+    Quantize the image into `num_colors` colors, the image is downscaled and its pixels are
+    binned first, then the bins are clustered with k-means weighted by their pixel counts.
+    """
+    image = image.convert("RGBA")
+    image.thumbnail(QUANTIZE_SIZE, Image.Resampling.BOX)
+    colors, counts = _color_histogram(np.asarray(image).reshape((-1, 4)), HISTOGRAM_BITS)
 
-    k_means = KMeans(n_clusters=num_colors, n_init="auto")
-    k_means.fit(image_array.reshape((-1, 4)))
-
-    return k_means.cluster_centers_.astype(int).tolist()
+    return _weighted_k_means(colors, counts, num_colors).astype(int).tolist()
 
 
 def extract_theme_light_colors(
@@ -52,7 +136,27 @@ def extract_theme_light_colors_hex(
     return list(map(rgb_to_hex, extract_theme_light_colors(image, num_colors)))
 
 
-async def get_img_from_url(url: str) -> Image.Image:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resopnse:
-            return Image.open(io.BytesIO(await resopnse.read()))
+def _theme_light_colors_hex_from_bytes(data: bytes) -> list[int]:
+    return extract_theme_light_colors_hex(Image.open(io.BytesIO(data)))
+
+
+async def get_theme_light_colors_hex(url: str) -> list[int]:
+    """
+    Download the image and extract its light theme colors in a thread, off the event loop.
+    The image is revalidated against the thumbnail cache, and the colors are looked up
+    by the image content hash first.
+    """
+    start = time.perf_counter()
+    data, _ = await fetch_cached(url, cache=thumbnail_cache, binary=True)
+    theme_color_stats.downloads += 1
+    theme_color_stats.download_time += (now := time.perf_counter()) - start
+
+    if (colors := theme_color_cache.get(key := theme_color_cache.key(data))) is not None:
+        return colors
+    colors = await asyncio.get_running_loop().run_in_executor(
+        None, _theme_light_colors_hex_from_bytes, data
+    )
+    theme_color_stats.extractions += 1
+    theme_color_stats.extract_time += time.perf_counter() - now
+    theme_color_cache.put(key, colors)
+    return colors
@@ -1,5 +1,3 @@
-import aiohttp
-
 from .http import fetch_as_json
 
 
@@ -36,25 +34,23 @@ class CommentList(list[Comment]):
     async def update(self) -> None:
         self.clear()
         page = 1
-        async with aiohttp.ClientSession() as session:
-            while True:
-                data = await fetch_as_json(
-                    f"https://api.czbooks.net/web/comment/list?novelId={self.novel_id}&page={page}&cleanCache=true",  # noqa
-                    session,
-                )
-                items = data["data"]["items"]
-                self.extend(
-                    [
-                        Comment(
-                            comment["id"],
-                            comment["nickname"],
-                            comment["message"],
-                            comment["date"],
-                            comment["replyId"] or None,
-                        )
-                        for comment in items
-                    ]
-                )
-
-                if not (page := data.get("next")):
-                    break
+        while True:
+            data = await fetch_as_json(
+                f"https://api.czbooks.net/web/comment/list?novelId={self.novel_id}&page={page}&cleanCache=true",  # noqa
+            )
+            items = data["data"]["items"]
+            self.extend(
+                [
+                    Comment(
+                        comment["id"],
+                        comment["nickname"],
+                        comment["message"],
+                        comment["date"],
+                        comment["replyId"] or None,
+                    )
+                    for comment in items
+                ]
+            )
+
+            if not (page := data.get("next")):
+                break
@@ -0,0 +1,93 @@
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# the first byte of the compressed data tells the codec, upper case if compressed with a dictionary
+_ZLIB = b"z"
+_ZSTD = b"s"
+DICTIONARY_SIZE = 32 * 1024  # zlib only uses the last 32KB of a dictionary
+
+
+class CompressionStats:
+    def __init__(self) -> None:
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.decoded = 0
+        self.decode_time = 0.0
+
+    @property
+    def ratio(self) -> float:
+        return self.compressed_bytes / self.raw_bytes if self.raw_bytes else 0
+
+    @property
+    def average_decode_time(self) -> float:
+        return self.decode_time / self.decoded if self.decoded else 0
+
+    def to_dict(self) -> dict:
+        return {
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "ratio": self.ratio,
+            "decoded": self.decoded,
+            "average_decode_time": self.average_decode_time,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+def build_dictionary(samples: list[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Build a raw content dictionary from sample texts of a novel.
+    """
+    return "".join(samples).encode()[-size:]
+
+
+def _zstd_dictionary(dictionary: bytes | None) -> "zstandard.ZstdCompressionDict | None":
+    if not dictionary:
+        return None
+    return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+
+def compress(text: str, dictionary: bytes = None) -> bytes:
+    """
+    Compress the text with zstd if installed, else zlib.
+    """
+    raw = text.encode()
+    if zstandard is not None:
+        codec = _ZSTD
+        data = zstandard.ZstdCompressor(dict_data=_zstd_dictionary(dictionary)).compress(raw)
+    else:
+        codec = _ZLIB
+        compressor = zlib.compressobj(zdict=dictionary) if dictionary else zlib.compressobj()
+        data = compressor.compress(raw) + compressor.flush()
+    data = (codec.upper() if dictionary else codec) + data
+
+    compression_stats.raw_bytes += len(raw)
+    compression_stats.compressed_bytes += len(data)
+    return data
+
+
+def decompress(data: bytes, dictionary: bytes = None) -> str:
+    start = time.perf_counter()
+    codec, data = data[:1], data[1:]
+    if codec.islower():
+        dictionary = None
+    elif not dictionary:
+        raise ValueError("the content was compressed with a dictionary")
+    codec = codec.lower()
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to decompress this content")
+        raw = zstandard.ZstdDecompressor(dict_data=_zstd_dictionary(dictionary)).decompress(data)
+    else:
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        raw = decompressor.decompress(data) + decompressor.flush()
+
+    compression_stats.decoded += 1
+    compression_stats.decode_time += time.perf_counter() - start
+    return raw.decode()
@@ -17,3 +17,31 @@ RE_WHITESPACE_CHAR = re.compile(r"\s")
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"  # noqa
 CRAWLER_HEADER = {"User-Agent": USER_AGENT}
 DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+# http client
+HTTP_CONNECTION_LIMIT = 100
+HTTP_CONNECTION_LIMIT_PER_HOST = 8
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 30
+
+# get content
+GET_CONTENT_WORKERS = 8
+
+# rate limit (per host)
+RATE_LIMIT_RATE = 5.0
+RATE_LIMIT_MIN_RATE = 0.5
+RATE_LIMIT_MAX_RATE = 20.0
+RATE_LIMIT_CONCURRENCY = 8
+RATE_LIMIT_MAX_CONCURRENCY = 16
+RATE_LIMIT_DECREASE_WINDOW = 1.0  # seconds
+
+# http cache
+HTTP_CACHE_PATH = "data/http_cache"
+HTTP_CACHE_MAX_SIZE = 64 * 1024 * 1024  # 64MB
+THUMBNAIL_CACHE_PATH = "data/thumbnail_cache"
+THUMBNAIL_CACHE_MAX_SIZE = 32 * 1024 * 1024  # 32MB
+THEME_COLOR_CACHE_PATH = "data/theme_colors.json"
+THEME_COLOR_CACHE_MAX_ENTRIES = 4096
+THEME_COLOR_CACHE_SAVE_DELAY = 10  # seconds
+
+# parser
+PARSER_WORKERS = 0  # 0 to parse in the event loop
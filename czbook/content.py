@@ -1,11 +1,15 @@
 import asyncio
+import inspect
 
-import aiohttp
+from typing import Any, Callable
 
-from .http import fetch_as_html
+from .const import GET_CONTENT_WORKERS
+from .http import fetch_as_text
+from .parser import parse_html, run_parser
 from .utils import now_timestamp, time_diff, is_out_of_date
 from .chapter import ChapterInfo, ChapterList
 from .error import ChapterNoContentError
+from .index import ContentIndex
 
 
 class GetContentState:
@@ -54,28 +58,69 @@ class GetContentState:
         return self._progress_bar_cache
 
 
+def _extract_content(text: str) -> str:
+    return parse_html(text, "chapter").find("div", class_="content").text
+
+
 class GetContent:
-    async def get_content(self, chapter_list: ChapterList, state: GetContentState) -> None:
+    @staticmethod
+    async def _get_chapter(chapter: ChapterInfo) -> None:
+        try:
+            chapter._error = None
+            chapter.content = await run_parser(_extract_content, await fetch_as_text(chapter.url))
+        except Exception as e:
+            print(f"Error when getting {chapter.url}: {e}")
+            chapter._error = str(e)
+
+    async def get_content(
+        self,
+        chapter_list: ChapterList,
+        state: GetContentState,
+        workers: int = GET_CONTENT_WORKERS,
+        on_chapter: Callable[[ChapterInfo], Any] = None,
+    ) -> None:
         """
         Get the content of the novel.
+        At most `workers` chapters are downloaded at the same time.
+        Chapters which already have content are skipped, so an interrupted download can resume,
+        except the ones whose `on_chapter` failed.
+        `on_chapter` is called (and awaited if it returns an awaitable)
+        with each chapter downloaded successfully.
         """
-        async with aiohttp.ClientSession() as session:
-            for index, chapter in enumerate(chapter_list, start=1):
-                state.current = index
-                try:
-                    soup = await fetch_as_html(chapter.url, session)
-                    chapter.content = soup.find("div", class_="content").text
-                except Exception as e:
-                    print(f"Error when getting {chapter.url}: {e}")
-                    chapter._error = str(e)
-
-        state.finished = True
+        queue: asyncio.Queue[ChapterInfo] = asyncio.Queue()
+        for chapter in chapter_list:
+            if not chapter.has_content or chapter._error:
+                queue.put_nowait(chapter)
+            else:
+                state.current += 1
+
+        async def worker() -> None:
+            while not queue.empty():
+                await self._get_chapter(chapter := queue.get_nowait())
+                if on_chapter and not chapter._error:
+                    try:
+                        if inspect.isawaitable(result := on_chapter(chapter)):
+                            await result
+                    except Exception as e:
+                        print(f"Error when saving {chapter.url}: {e}")
+                        chapter._error = str(e)
+                state.current += 1
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+        finally:
+            state.finished = True
         return None
 
     @classmethod
-    def start(cls: type["GetContent"], chapter_list: ChapterList) -> GetContentState:
+    def start(
+        cls: type["GetContent"],
+        chapter_list: ChapterList,
+        workers: int = GET_CONTENT_WORKERS,
+        on_chapter: Callable[[ChapterInfo], Any] = None,
+    ) -> GetContentState:
         state = GetContentState(None, None, 0, chapter_list.total_chapter_count)
-        task = asyncio.create_task(cls.get_content(cls, chapter_list, state))
+        task = asyncio.create_task(cls.get_content(cls, chapter_list, state, workers, on_chapter))
         state.task = task
 
         return state
@@ -180,10 +225,12 @@ def search_content(
     keyword: str,
     highlight: str = None,
     context_length: int = 20,
+    index: ContentIndex = None,
 ) -> list[ContentSearchResult]:
     """
     Args:
         highlight must be like: "**%s**"
+        index: the content index of the chapter list, which is scanned if it doesn't match.
 
     Return: `list[ContentSearchResult]`
         the search results' context in content with the keyword.
@@ -193,6 +240,8 @@ def search_content(
     """
     if highlight:
         highlight = highlight % keyword
+    if index and keyword and index.matches(chapter_list):
+        return _search_content_index(chapter_list, keyword, highlight, context_length, index)
     results = []
     for chapter in chapter_list:
         if not chapter.content:
@@ -209,3 +258,29 @@ def search_content(
         )
 
     return results
+
+
+def _search_content_index(
+    chapter_list: ChapterList,
+    keyword: str,
+    highlight: str,
+    context_length: int,
+    index: ContentIndex,
+) -> list[ContentSearchResult]:
+    missing = [i for i, chapter in enumerate(chapter_list) if not chapter.has_content]
+    if missing := missing[:1] + index.empty_chapters[:1]:
+        chapter = chapter_list[min(missing)]
+        raise ChapterNoContentError(f"Chapter '{chapter.name}' hasn't had content")
+
+    return [
+        ContentSearchResult(
+            chapter=chapter_list[chapter_index],
+            keyword=keyword,
+            position=pos,
+            context_length=context_length,
+            highlight=highlight,
+        )
+        for chapter_index, pos in index.search(keyword)
+        # the scan starts after the first character
+        if pos > 0
+    ]
@@ -1,11 +1,77 @@
 import asyncio
+import sys
+
+from typing import IO, Any, Awaitable, Callable, Iterator
+
 from .novel_info import NovelInfo, Author, Category, HashtagList, Thumbnail
 from .chapter import ChapterList, ChapterInfo
 from .comment import CommentList
+from .const import GET_CONTENT_WORKERS
 from .content import GetContent, GetContentState
-from .http import fetch_as_html
+from .index import ContentIndex
+from .http import HyperLink, fetch_cached
+from .parser import parse_html, run_parser
 from .utils import now_timestamp
 
+# the NovelInfo fields compared by Novel.update
+INFO_FIELDS = (
+    "title",
+    "description",
+    "thumbnail",
+    "author",
+    "state",
+    "last_update",
+    "views",
+    "category",
+    "hashtags",
+)
+
+
+def _comparable(value: Any) -> Any:
+    if isinstance(value, HyperLink):
+        return value.text, value.url
+    if isinstance(value, Thumbnail):
+        return value.url
+    if isinstance(value, list):
+        return tuple(_comparable(item) for item in value)
+    return value
+
+
+class NovelChanges:
+    """
+    What an update changed in a novel.
+
+    fields: `set[str]`
+        the changed NovelInfo fields, and `chapter_list` if the chapter names or order changed
+    new_chapters: `list[ChapterInfo]`
+        the chapters added since the last fetch
+    removed_chapters: `list[ChapterInfo]`
+        the chapters no longer listed
+    rechecked_chapters: `list[ChapterInfo]`
+        the known chapters whose content was cleared to be fetched again
+    """
+
+    def __init__(
+        self,
+        fields: set[str] = None,
+        new_chapters: list[ChapterInfo] = None,
+        removed_chapters: list[ChapterInfo] = None,
+        rechecked_chapters: list[ChapterInfo] = None,
+    ) -> None:
+        self.fields = fields or set()
+        self.new_chapters = new_chapters or []
+        self.removed_chapters = removed_chapters or []
+        self.rechecked_chapters = rechecked_chapters or []
+
+    def __bool__(self) -> bool:
+        return bool(self.fields)
+
+    def __repr__(self) -> str:
+        return (
+            f"<NovelChanges fields={sorted(self.fields)} new={len(self.new_chapters)}"
+            f" removed={len(self.removed_chapters)} rechecked={len(self.rechecked_chapters)}>"
+        )
+
 
 class Novel:
     def __init__(
@@ -27,6 +93,9 @@ class Novel:
 
         self._comment_last_update: float = 0
         self._get_content_state: GetContentState = None
+        # the chapter list wasn't merged by the last update because of a running download
+        self._merge_deferred = False
+        self.content_index: ContentIndex = None
 
     @property
     def title(self):
@@ -70,40 +139,80 @@ class Novel:
             self._word_count = sum(chapter.word_count for chapter in self.chapter_list)
         return self._word_count
 
+    @property
+    def estimated_size(self) -> int:
+        """
+        Rough memory usage in bytes, dominated by the chapter contents.
+        """
+        return (
+            sys.getsizeof(self.description)
+            + sum(chapter.estimated_size for chapter in self.chapter_list)
+            + (self.content_index.size if self.content_index else 0)
+        )
+
     @property
     def content_cache(self) -> bool:
         return self._content_cache
 
+    @property
+    def is_getting_content(self) -> bool:
+        return bool(self._get_content_state and not self._get_content_state.finished)
+
     @property
     def content(self) -> str:
-        info = (
+        return "".join(self.iter_content())
+
+    def iter_content(self) -> Iterator[str]:
+        """
+        Yield the exported text piece by piece, without building the whole text in memory.
+        """
+        yield (
             f"{self.title} —— {self.author.name}\n"
             f"連結：https://czbooks.net/n/{self.id}\n"
             f"作者：{self.author.name}\n"
             f"總章數：{self.chapter_list.total_chapter_count}\n"
             f"總字數：{self.word_count}\n"
+            "\n\n"
         )
-        content = "\n\n\n".join(
-            f"{'-'*30} {chapter.name} {'-'*30}\n"
-            + (
-                f"本章擷取失敗，請至網站閱讀：{chapter.url}"
-                if chapter._error
-                else (("(本章可能非內文)\n\n" if chapter.maybe_not_conetent else "\n") + chapter.content)
-            )
-            for chapter in self.chapter_list
-        )
-        return info + "\n\n" + content
+        for index, chapter in enumerate(self.chapter_list):
+            if index:
+                yield "\n\n\n"
+            yield f"{'-'*30} {chapter.name} {'-'*30}\n"
+            if chapter._error:
+                yield f"本章擷取失敗，請至網站閱讀：{chapter.url}"
+            else:
+                yield "(本章可能非內文)\n\n" if chapter.maybe_not_conetent else "\n"
+                yield chapter.content
+
+    def write_content(self, fp: IO[str]) -> None:
+        for chunk in self.iter_content():
+            fp.write(chunk)
 
     async def update_comments(self) -> None:
         await self.comment.update()
 
     async def _get_content(self) -> None:
-        await self._get_content_state.task
-        self._content_cache = True
+        try:
+            await self._get_content_state.task
+        finally:
+            self._content_cache = all(
+                chapter.has_content and not chapter._error for chapter in self.chapter_list
+            )
+            if self._content_cache:
+                # counted again with the new chapters
+                self._word_count = None
+            if self._merge_deferred:
+                # be refreshed again to merge the chapters
+                self.last_fetch_time = 0
 
-    def get_content(self) -> GetContentState:
-        if not self._get_content_state:
-            self._get_content_state = GetContent.start(self.chapter_list)
+    def get_content(
+        self,
+        workers: int = GET_CONTENT_WORKERS,
+        on_chapter: Callable[[ChapterInfo], Any] = None,
+    ) -> GetContentState:
+        # a finished download is started again to retry the chapters which failed
+        if not self._get_content_state or self._get_content_state.finished:
+            self._get_content_state = GetContent.start(self.chapter_list, workers, on_chapter)
             loop = asyncio.get_event_loop()
             loop.create_task(self._get_content())
         return self._get_content_state
@@ -114,17 +223,89 @@ class Novel:
         self._get_content_state.task.cancel()
         self._get_content_state = None
 
-    async def update(self) -> bool:
+    async def update(
+        self, recheck_last: int = 0, load_contents: Callable[["Novel"], Awaitable[Any]] = None
+    ) -> NovelChanges:
         """
-        Return True if updated.
+        Update the novel in place, the downloaded content of the known chapters is kept.
+        If the novel was updated on the website, the content of the last `recheck_last`
+        known chapters is cleared to be downloaded again.
+
+        `load_contents` is awaited with the novel before the chapters of a downloaded novel
+        are merged, to fill in the contents which aren't in memory, so the word count only
+        loses the rechecked and removed chapters.
+
+        The chapters aren't merged while the content is being downloaded,
+        since the download wouldn't get the new ones.
+
+        Return the changes, which are falsy if nothing changed.
         """
-        updated_novel = await fetch_novel(self.id, False)
-        if updated_novel.last_update != self.last_update:
-            self = updated_novel
-            await self.thumbnail.get_theme_colors()
-            return True
+        if self.is_getting_content:
+            return NovelChanges()
+        # parse the page even if it wasn't modified, when the last chapters weren't merged
+        updated_novel = await fetch_novel(self.id, False, not self._merge_deferred)
         self.last_fetch_time = now_timestamp()
-        return False
+        if not updated_novel:
+            return NovelChanges()
+
+        info = updated_novel.info
+        changes = NovelChanges(
+            {
+                field
+                for field in INFO_FIELDS
+                if _comparable(getattr(info, field)) != _comparable(getattr(self.info, field))
+            }
+        )
+        if "thumbnail" not in changes.fields:
+            # keep the theme colors already extracted
+            info.thumbnail = self.thumbnail
+        elif info.thumbnail:
+            info.thumbnail.start_getting_theme_colors()
+        self.info = info
+
+        old_chapters = [(chapter.name, chapter.url) for chapter in self.chapter_list]
+        new_chapters = [(chapter.name, chapter.url) for chapter in updated_novel.chapter_list]
+        if old_chapters == new_chapters and "last_update" not in changes.fields:
+            self._merge_deferred = False
+            return changes
+        if load_contents and self._content_cache:
+            await load_contents(self)
+        if self.is_getting_content:
+            # the download started meanwhile, merge the chapters after it
+            self._merge_deferred = True
+            return changes
+        self._merge_deferred = False
+
+        known = {url for _, url in old_chapters}
+        merged = self.chapter_list.merge(updated_novel.chapter_list)
+        listed = {chapter.url for chapter in merged}
+        changes.new_chapters = [chapter for chapter in merged if chapter.url not in known]
+        changes.removed_chapters = [
+            chapter for chapter in self.chapter_list if chapter.url not in listed
+        ]
+        if old_chapters != new_chapters:
+            changes.fields.add("chapter_list")
+        if recheck_last > 0:
+            changes.rechecked_chapters = [chapter for chapter in merged if chapter.url in known][
+                -recheck_last:
+            ]
+        if self._word_count:
+            # the new chapters are counted once downloaded
+            self._word_count -= sum(
+                chapter.word_count
+                for chapter in changes.rechecked_chapters + changes.removed_chapters
+            )
+        for chapter in changes.rechecked_chapters:
+            chapter.clear_content()
+
+        self.chapter_list = merged
+        self.content_index = None
+        self._content_cache = all(
+            chapter.has_content and not chapter._error for chapter in self.chapter_list
+        )
+        if self._get_content_state and self._get_content_state.finished:
+            self._get_content_state = None
+        return changes
 
     def to_dict(self) -> dict:
         return {
@@ -169,38 +350,39 @@ class Novel:
         )
 
 
-async def fetch_novel(id: str, first: bool = True) -> Novel:
-    soup = await fetch_as_html(f"https://czbooks.net/n/{id}")
-    # state / detail / info
-    state_children = soup.find("div", class_="state").find_all("td")
-    detail_div = soup.find("div", class_="novel-detail")
-    thumbnail_url = detail_div.find("img").get("src")
-    category_a = state_children[9].contents[0]
+async def fetch_novel(id: str, first: bool = True, only_if_modified: bool = False) -> Novel | None:
+    """
+    Fetch the novel page, the response is cached on disk and revalidated with a conditional request.
+
+    Return None if `only_if_modified` and the page has not been modified since the last fetch.
+    If `first`, the theme colors of the thumbnail are gotten in the background.
+    """
+    text, modified = await fetch_cached(f"https://czbooks.net/n/{id}")
+    if only_if_modified and not modified:
+        return None
+    data = await run_parser(_parse_novel_page, text)
+    thumbnail_url = data["thumbnail"]
     info = NovelInfo(
         id=id,
-        title=detail_div.find("span", class_="title").text,
-        description=detail_div.find("div", class_="description").text,
-        thumbnail=Thumbnail(thumbnail_url)
-        if thumbnail_url.startswith("https://img.czbooks.net")
-        else None,
-        author=Author(detail_div.find("span", class_="author").contents[1].text),
-        state=state_children[1].text,
-        last_update=state_children[7].text,
-        views=state_children[5].text,
-        category=Category(category_a.text, "https:" + category_a["href"]),
-        hashtags=HashtagList.from_list(
-            [hashtag.text for hashtag in soup.find("ul", class_="hashtag").find_all("a")[:-1]]
+        title=data["title"],
+        description=data["description"],
+        thumbnail=(
+            Thumbnail(thumbnail_url)
+            if thumbnail_url.startswith("https://img.czbooks.net")
+            else None
         ),
+        author=Author(data["author"]),
+        state=data["state"],
+        last_update=data["last_update"],
+        views=data["views"],
+        category=Category(*data["category"]),
+        hashtags=HashtagList.from_list(data["hashtags"]),
     )
     if info.thumbnail and first:
-        await info.thumbnail.get_theme_colors()
+        # not awaited, the novel is returned without waiting for the image
+        info.thumbnail.start_getting_theme_colors()
     # chapter list
-    chapter_list = ChapterList(
-        [
-            ChapterInfo(chapter.text, "https:" + chapter["href"])
-            for chapter in soup.find("ul", id="chapter-list").find_all("a")
-        ]
-    )
+    chapter_list = ChapterList([ChapterInfo(name, url) for name, url in data["chapters"]])
 
     return Novel(
         id=id,
@@ -208,3 +390,38 @@ async def fetch_novel(id: str, first: bool = True) -> Novel:
         chapter_list=chapter_list,
         last_fetch_time=now_timestamp(),
     )
+
+
+def _parse_views(text: str) -> int | str:
+    digits = text.strip().replace(",", "")
+    return int(digits) if digits.isdigit() else text
+
+
+def _parse_novel_page(text: str) -> dict:
+    """
+    Extract the novel data from the page into plain python objects,
+    so that it can run in the parser process pool.
+    """
+    soup = parse_html(text, "novel")
+    # state / detail / info
+    state_children = soup.find("div", class_="state").find_all("td")
+    detail_div = soup.find("div", class_="novel-detail")
+    category_a = state_children[9].contents[0]
+    return {
+        "title": detail_div.find("span", class_="title").text,
+        "description": detail_div.find("div", class_="description").text,
+        "thumbnail": detail_div.find("img").get("src"),
+        "author": detail_div.find("span", class_="author").contents[1].text,
+        "state": state_children[1].text,
+        "last_update": state_children[7].text,
+        # an int like the views loaded from the database, so they compare equal
+        "views": _parse_views(state_children[5].text),
+        "category": (category_a.text, "https:" + category_a["href"]),
+        "hashtags": [
+            hashtag.text for hashtag in soup.find("ul", class_="hashtag").find_all("a")[:-1]
+        ],
+        "chapters": [
+            (chapter.text, "https:" + chapter["href"])
+            for chapter in soup.find("ul", id="chapter-list").find_all("a")
+        ],
+    }
@@ -23,3 +23,12 @@ class ChapterNoContentError(Exception):
 
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
+
+
+class InvalidQueryError(Exception):
+    """
+    The search query is malformed.
+    """
+
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
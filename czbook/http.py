@@ -1,11 +1,22 @@
 import asyncio
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, TraceConfig
 
 from bs4 import BeautifulSoup
 
-from .const import DEFAULT_TIMEOUT, CRAWLER_HEADER
+from .const import (
+    CRAWLER_HEADER,
+    DEFAULT_TIMEOUT,
+    HTTP_CONNECTION_LIMIT,
+    HTTP_CONNECTION_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+)
+from .cache import CacheEntry, HttpCache, http_cache
 from .error import NotFoundError, TooManyRequestsError
+from .parser import parse_html
+from .ratelimit import rate_limiter, parse_retry_after
+from .utils.singleflight import SingleFlight
 
 
 class HyperLink:
@@ -23,21 +34,121 @@ class HyperLink:
         }
 
 
+class HttpClient:
+    """
+    A shared http client which keeps the connections alive between requests.
+
+    The underlying session is created on first use and must be closed by `close`.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_CONNECTION_LIMIT,
+        limit_per_host: int = HTTP_CONNECTION_LIMIT_PER_HOST,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+
+        self._session: ClientSession = None
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self._new_session()
+        return self._session
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+        }
+
+    def _new_session(self) -> ClientSession:
+        trace_config = TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_create)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+        return ClientSession(
+            connector=TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            ),
+            timeout=self.timeout,
+            trace_configs=[trace_config],
+        )
+
+    async def _on_connection_create(self, *_) -> None:
+        self.connections_opened += 1
+
+    async def _on_connection_reuse(self, *_) -> None:
+        self.connections_reused += 1
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HttpClient()
+# coalesce concurrent requests of the same url
+url_flight = SingleFlight()
+
+
+def get_session() -> ClientSession:
+    """
+    Get the session of the shared http client.
+    """
+    return http_client.session
+
+
+async def close() -> None:
+    """
+    Close the shared http client.
+    """
+    await http_client.close()
+
+
 async def _fetch_url(
     session: ClientSession,
     url: str,
     encode_type: str,
     max_retry: int,
     now_retry: int,
-) -> str | dict:
+    headers: dict = None,
+) -> str | dict | CacheEntry | None:
     try:
-        async with session.get(url, headers=CRAWLER_HEADER, timeout=DEFAULT_TIMEOUT) as response:
+        async with rate_limiter.get(url) as limiter, session.get(
+            url, headers={**CRAWLER_HEADER, **headers} if headers else CRAWLER_HEADER
+        ) as response:
             if response.status == 404:
                 raise NotFoundError("404 Not found")
-            if response.status == 429:
-                raise TooManyRequestsError("429 Too many requests")
+            if response.status == 429 or response.status >= 500:
+                limiter.throttle(parse_retry_after(response.headers.get("Retry-After")))
+                if response.status == 429:
+                    raise TooManyRequestsError("429 Too many requests")
+                response.raise_for_status()
+            limiter.success()
             if encode_type == "json":
                 return await response.json()
+            elif encode_type in ("entry", "binary_entry"):
+                if response.status == 304:
+                    return None
+                return CacheEntry(
+                    url,
+                    await (response.read() if encode_type == "binary_entry" else response.text()),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
             else:
                 return await response.text()
     except NotFoundError as e:
@@ -45,7 +156,7 @@ async def _fetch_url(
     except Exception as e:
         if now_retry < max_retry:
             await asyncio.sleep(now_retry)
-            return await _fetch_url(session, url, encode_type, max_retry, now_retry + 1)
+            return await _fetch_url(session, url, encode_type, max_retry, now_retry + 1, headers)
         raise e
 
 
@@ -54,23 +165,62 @@ async def fetch_url(
     url: str,
     encode_type: str,
     max_retry: int = 3,
-) -> str | dict:
-    return await _fetch_url(session, url, encode_type, max_retry, 0)
+    headers: dict = None,
+) -> str | dict | CacheEntry | None:
+    return await _fetch_url(session, url, encode_type, max_retry, 0, headers)
 
 
-async def fetch_as_text(url: str, session: ClientSession = None) -> str:
+async def fetch_cached(
+    url: str,
+    session: ClientSession = None,
+    cache: HttpCache = http_cache,
+    binary: bool = False,
+) -> tuple[str | bytes, bool]:
+    """
+    Fetch the url with a conditional request against the cache.
+
+    Return: `tuple[str | bytes, bool]`
+        the text (the bytes if `binary`), and False if the server answered 304 Not Modified.
+    """
+    return await url_flight.do(("cached", url, binary), _fetch_cached, url, session, cache, binary)
+
+
+async def _fetch_cached(
+    url: str, session: ClientSession, cache: HttpCache, binary: bool
+) -> tuple[str | bytes, bool]:
+    if cached := await cache.get(url):
+        cache.hits += 1
+    else:
+        cache.misses += 1
+    entry = await fetch_url(
+        session or get_session(),
+        url,
+        "binary_entry" if binary else "entry",
+        headers=cached and cached.validators,
+    )
+    if entry is None and cached:
+        cache.not_modified += 1
+        return cached.content, False
+
+    await cache.put(entry)
+    return entry.content, True
+
+
+async def fetch_as_text(url: str, session: ClientSession = None, cache: bool = False) -> str:
+    if cache:
+        return (await fetch_cached(url, session))[0]
     if session:
         return await fetch_url(session, url, "text")
-    async with ClientSession() as session:
-        return await fetch_url(session, url, "text")
+    return await url_flight.do(("text", url), fetch_url, get_session(), url, "text")
 
 
 async def fetch_as_json(url: str, session: ClientSession = None) -> dict:
     if session:
         return await fetch_url(session, url, "json")
-    async with ClientSession() as session:
-        return await fetch_url(session, url, "json")
+    return await url_flight.do(("json", url), fetch_url, get_session(), url, "json")
 
 
-async def fetch_as_html(url: str, session: ClientSession = None) -> BeautifulSoup:
-    return BeautifulSoup(await fetch_as_text(url, session), "html.parser")
+async def fetch_as_html(
+    url: str, session: ClientSession = None, cache: bool = False, page: str = None
+) -> BeautifulSoup:
+    return parse_html(await fetch_as_text(url, session, cache), page)
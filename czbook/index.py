@@ -0,0 +1,140 @@
+"""
+Inverted character bigram index of a novel's content.
+"""
+
+import hashlib
+import io
+import zlib
+
+import numpy as np
+
+from .chapter import ChapterList
+
+# joins the chapters, so no bigram spans two chapters
+SEPARATOR = "\0"
+# bits of a character code point
+CHAR_BITS = 21
+
+
+def chapter_list_signature(chapter_list: ChapterList) -> bytes:
+    return hashlib.sha1("\n".join(chapter.url for chapter in chapter_list).encode()).digest()
+
+
+class ContentIndex:
+    """
+    Map each character bigram of the content to its sorted positions,
+    a keyword is found at the positions where all its consecutive bigrams line up.
+    """
+
+    def __init__(
+        self,
+        signature: bytes,
+        chapter_starts: np.ndarray,
+        keys: np.ndarray,
+        offsets: np.ndarray,
+        positions: np.ndarray,
+    ) -> None:
+        self.signature = signature
+        # position of each chapter in the joined content
+        self._chapter_starts = chapter_starts
+        # sorted unique bigrams, and the slice of `positions` holding each one's positions
+        self._keys = keys
+        self._offsets = offsets
+        self._positions = positions
+
+    @property
+    def size(self) -> int:
+        return sum(
+            array.nbytes
+            for array in (self._chapter_starts, self._keys, self._offsets, self._positions)
+        )
+
+    @property
+    def empty_chapters(self) -> list[int]:
+        """
+        The indexes of the chapters with empty content.
+        """
+        ends = np.append(self._chapter_starts[1:], self._positions.size + 1)
+        return np.flatnonzero(ends - self._chapter_starts == 1).tolist()
+
+    def matches(self, chapter_list: ChapterList) -> bool:
+        return self.signature == chapter_list_signature(chapter_list)
+
+    @classmethod
+    def build(cls: type["ContentIndex"], chapter_list: ChapterList) -> "ContentIndex":
+        lengths = [len(chapter.content) for chapter in chapter_list]
+        text = SEPARATOR.join(chapter.content for chapter in chapter_list) + SEPARATOR
+        chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        bigrams = (chars[:-1] << CHAR_BITS) | chars[1:]
+
+        positions = np.argsort(bigrams, kind="stable").astype(np.int32)
+        keys, offsets = np.unique(bigrams[positions], return_index=True)
+        chapter_starts = np.cumsum([0] + [length + 1 for length in lengths])[: len(lengths)]
+        return cls(
+            chapter_list_signature(chapter_list),
+            np.asarray(chapter_starts, dtype=np.int64),
+            keys,
+            np.append(offsets, len(positions)).astype(np.int64),
+            positions,
+        )
+
+    def _bigram_positions(self, bigram: int) -> np.ndarray:
+        index = np.searchsorted(self._keys, bigram)
+        if index == len(self._keys) or self._keys[index] != bigram:
+            return self._positions[:0]
+        return self._positions[self._offsets[index] : self._offsets[index + 1]]
+
+    def _char_positions(self, char: int) -> np.ndarray:
+        # every bigram starting with the character, the separator ends the last one
+        start, end = np.searchsorted(self._keys, [char << CHAR_BITS, (char + 1) << CHAR_BITS])
+        return np.sort(self._positions[self._offsets[start] : self._offsets[end]])
+
+    def search(self, keyword: str) -> list[tuple[int, int]]:
+        """
+        Return the (chapter index, position in the chapter) of every occurrence of the keyword,
+        overlapping ones included, like the scan except that it doesn't skip position 0.
+        """
+        if not keyword or SEPARATOR in keyword:
+            return []
+        chars = [ord(char) for char in keyword]
+        if len(chars) == 1:
+            found = self._char_positions(chars[0])
+        else:
+            bigrams = [(a << CHAR_BITS) | b for a, b in zip(chars, chars[1:])]
+            candidates = sorted(
+                ((self._bigram_positions(bigram), offset) for offset, bigram in enumerate(bigrams)),
+                key=lambda candidate: len(candidate[0]),
+            )
+            # start from the rarest bigram
+            found = candidates[0][0] - candidates[0][1]
+            for positions, offset in candidates[1:]:
+                if not len(found):
+                    break
+                found = found[np.isin(found + offset, positions, assume_unique=True)]
+            found = np.sort(found)
+
+        chapters = np.searchsorted(self._chapter_starts, found, side="right") - 1
+        return list(zip(chapters.tolist(), (found - self._chapter_starts[chapters]).tolist()))
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            signature=np.frombuffer(self.signature, dtype=np.uint8),
+            chapter_starts=self._chapter_starts,
+            keys=self._keys,
+            offsets=self._offsets,
+            positions=self._positions,
+        )
+        return zlib.compress(buffer.getvalue(), 1)
+
+    @classmethod
+    def from_bytes(cls: type["ContentIndex"], data: bytes) -> "ContentIndex":
+        arrays = np.load(io.BytesIO(zlib.decompress(data)))
+        return cls(
+            arrays["signature"].tobytes(),
+            arrays["chapter_starts"],
+            arrays["keys"],
+            arrays["offsets"],
+            arrays["positions"],
+        )
@@ -1,3 +1,5 @@
+import asyncio
+
 from .. import color
 
 
@@ -15,6 +17,7 @@ class Thumbnail:
         """
         self._url = url
         self._theme_color: list[int] = None
+        self._theme_color_task: asyncio.Task = None
 
     @property
     def url(self) -> str:
@@ -42,17 +45,42 @@ class Thumbnail:
             )
         return self._theme_color
 
+    @property
+    def has_theme_color(self) -> bool:
+        """
+        Whether the theme color has been gotten.
+
+        :rtype: bool.
+        """
+        return self._theme_color is not None
+
+    def start_getting_theme_colors(self) -> asyncio.Task:
+        """
+        Start getting the theme color of the thumbnail in the background.
+        A failed attempt is started again.
+
+        :rtype: asyncio.Task.
+        """
+        if self._theme_color_task is None or (
+            self._theme_color_task.done() and not self.has_theme_color
+        ):
+            self._theme_color_task = asyncio.create_task(self._get_theme_colors())
+        return self._theme_color_task
+
+    async def _get_theme_colors(self) -> list[int]:
+        self._theme_color = await color.get_theme_light_colors_hex(self.url)
+        return self._theme_color
+
     async def get_theme_colors(self) -> list[int]:
         """
-        Get the theme color of the thumbnail.
+        Get the theme color of the thumbnail, the image is processed off the event loop.
 
         :type theme_color: list[int].
         :rtype: list[int].
         """
-        self._theme_color = color.extract_theme_light_colors_hex(
-            await color.get_img_from_url(self.url)
-        )
-        return self._theme_color
+        if self.has_theme_color:
+            return self._theme_color
+        return await asyncio.shield(self.start_getting_theme_colors())
 
     def to_dict(self) -> dict:
         """
@@ -62,7 +90,7 @@ class Thumbnail:
         :returns: The dict of the thumbnail data.
         :rtype: dict.
         """
-        return {"url": self.url, "theme_color": self.theme_color}
+        return {"url": self.url, "theme_color": self._theme_color}
 
     @classmethod
     def from_json(cls: type["Thumbnail"], data: dict) -> "Thumbnail":
@@ -0,0 +1,104 @@
+import asyncio
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .const import PARSER_WORKERS
+
+try:
+    import lxml  # noqa: F401
+
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+
+class AnyOfStrainer(SoupStrainer):
+    """
+    Keep the tags matched by any of the strainers.
+
+    Only beautifulsoup4 >= 4.13 asks the strainer before creating a tag,
+    older versions see an empty strainer and parse the whole page.
+    """
+
+    def __init__(self, *strainers: SoupStrainer) -> None:
+        super().__init__()
+        self.strainers = strainers
+
+    def allow_tag_creation(self, nsprefix: str | None, name: str, attrs: dict | None) -> bool:
+        return any(
+            strainer.allow_tag_creation(nsprefix, name, attrs) for strainer in self.strainers
+        )
+
+    def allow_string_creation(self, string: str) -> bool:
+        return False
+
+
+def _has_class(class_: str):
+    # the class attribute may not be split into a list yet when the strainer is asked
+    def match(value: str | list[str] | None) -> bool:
+        if isinstance(value, str):
+            value = value.split()
+        return bool(value) and class_ in value
+
+    return match
+
+
+# the nodes each page type needs
+PAGE_STRAINERS: dict[str, SoupStrainer] = {
+    "novel": AnyOfStrainer(
+        SoupStrainer("div", class_=_has_class("state")),
+        SoupStrainer("div", class_=_has_class("novel-detail")),
+        SoupStrainer("ul", class_=_has_class("hashtag")),
+        SoupStrainer("ul", id="chapter-list"),
+    ),
+    "chapter": SoupStrainer("div", class_=_has_class("content")),
+    "search": SoupStrainer("ul", class_=_has_class("novel-list")),
+}
+
+
+def parse_html(text: str, page: str = None) -> BeautifulSoup:
+    """
+    Parse the html with the fastest parser installed.
+
+    If `page` is given, only the nodes in `PAGE_STRAINERS[page]` are parsed.
+    """
+    return BeautifulSoup(text, PARSER, parse_only=page and PAGE_STRAINERS[page])
+
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def set_parser_workers(workers: int = PARSER_WORKERS) -> None:
+    """
+    Set the number of processes used by `run_parser`, 0 to parse in the event loop.
+    """
+    global _executor
+    shutdown_parser()
+    if workers > 0:
+        _executor = ProcessPoolExecutor(workers)
+
+
+def shutdown_parser() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+async def run_parser(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run the parsing function in the process pool, or inline if there isn't one.
+
+    `func` and its arguments must be picklable.
+    """
+    if _executor is None:
+        return func(*args)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    except BrokenProcessPool:
+        shutdown_parser()
+        return func(*args)
@@ -0,0 +1,215 @@
+"""
+Boolean and proximity search of several keywords in a single pass over the content.
+"""
+
+import re
+
+from .chapter import ChapterList
+from .content import ContentSearchResult
+from .error import ChapterNoContentError, InvalidQueryError
+
+# keywords within this many characters of each other when NEAR has no distance
+DEFAULT_NEAR_DISTANCE = 50
+RE_NEAR = re.compile(r"NEAR(?:/(\d+))?")
+
+
+class QueryGroup:
+    """
+    Keywords which must all be in a chapter, none of the excluded ones,
+    and each near pair within its distance.
+    """
+
+    def __init__(self) -> None:
+        self.include: list[str] = []
+        self.exclude: list[str] = []
+        self.near: list[tuple[str, str, int]] = []
+
+    def matches(self, positions: dict[str, list[int]]) -> bool:
+        return (
+            all(positions[keyword] for keyword in self.include)
+            and not any(positions[keyword] for keyword in self.exclude)
+            and all(
+                _near_positions(positions[a], len(a), positions[b], len(b), distance)
+                for a, b, distance in self.near
+            )
+        )
+
+    def shown(self, positions: dict[str, list[int]]) -> dict[str, list[int]]:
+        """
+        The positions to show of each keyword, keywords in a near pair only where they are near.
+        """
+        near: dict[str, set[int]] = {}
+        for a, b, distance in self.near:
+            near_a, near_b = _near_pairs(positions[a], len(a), positions[b], len(b), distance)
+            near.setdefault(a, set()).update(near_a)
+            near.setdefault(b, set()).update(near_b)
+        return {
+            keyword: sorted(near[keyword]) if keyword in near else positions[keyword]
+            for keyword in self.include
+        }
+
+
+class ContentQuery:
+    """
+    A content search query, the syntax is:
+        `A B` both A and B
+        `A | B` A or B, `|` binds looser than the others
+        `-A` without A
+        `A NEAR/50 B` A and B within 50 characters of each other, NEAR alone means 50
+    Keywords are matched in a chapter, so `A B` finds the chapters that have both.
+    """
+
+    def __init__(self, groups: list[QueryGroup]) -> None:
+        self.groups = groups
+        self.keywords = sorted(
+            {keyword for group in groups for keyword in (*group.include, *group.exclude)},
+            key=len,
+            reverse=True,
+        )
+        self._pattern = re.compile("|".join(re.escape(keyword) for keyword in self.keywords))
+        # whether two occurrences can overlap, then the matches can't be taken one after another
+        self._overlapping = any(
+            a[i:] == b[: len(a) - i] or (a is not b and b in a)
+            for a in self.keywords
+            for b in self.keywords
+            for i in range(1, len(a))
+        )
+
+    @classmethod
+    def parse(cls: type["ContentQuery"], query: str) -> "ContentQuery":
+        groups = []
+        group = QueryGroup()
+        near_distance = None
+        for token in query.split():
+            if token == "|":
+                groups.append(cls._check_group(group, near_distance))
+                group, near_distance = QueryGroup(), None
+            elif match := RE_NEAR.fullmatch(token):
+                if not group.include or near_distance is not None:
+                    raise InvalidQueryError("NEAR must be between two keywords")
+                near_distance = int(match.group(1) or DEFAULT_NEAR_DISTANCE)
+            elif token.startswith("-") and len(token) > 1:
+                if near_distance is not None:
+                    raise InvalidQueryError("NEAR must be between two keywords")
+                group.exclude.append(token[1:])
+            else:
+                if near_distance is not None:
+                    group.near.append((group.include[-1], token, near_distance))
+                    near_distance = None
+                group.include.append(token)
+        groups.append(cls._check_group(group, near_distance))
+        return cls(groups)
+
+    @staticmethod
+    def _check_group(group: QueryGroup, near_distance: int | None) -> QueryGroup:
+        if near_distance is not None:
+            raise InvalidQueryError("NEAR must be between two keywords")
+        if not group.include:
+            raise InvalidQueryError("Each part of the query needs a keyword to search for")
+        return group
+
+    def find(self, text: str) -> dict[str, list[int]]:
+        """
+        Return the positions of every keyword in the text, scanned once.
+        Like `search_content`, the scan starts after the first character.
+        """
+        positions = {keyword: [] for keyword in self.keywords}
+        if not self._overlapping:
+            for match in self._pattern.finditer(text, 1):
+                positions[match.group()].append(match.start())
+            return positions
+
+        pos = 1
+        while match := self._pattern.search(text, pos):
+            pos = match.start()
+            for keyword in self.keywords:
+                if text.startswith(keyword, pos):
+                    positions[keyword].append(pos)
+            # the next match may overlap this one
+            pos += 1
+        return positions
+
+    def search(self, text: str) -> list[tuple[int, str]] | None:
+        """
+        Return the sorted (position, keyword) hits if the text matches, else None.
+        """
+        positions = self.find(text)
+        if not (matched := [group for group in self.groups if group.matches(positions)]):
+            return None
+
+        shown: dict[str, list[int]] = {}
+        for group in matched:
+            for keyword, found in group.shown(positions).items():
+                if keyword in shown and shown[keyword] is not found:
+                    found = sorted(set(shown[keyword]) | set(found))
+                shown[keyword] = found
+        return sorted((pos, keyword) for keyword, found in shown.items() for pos in found)
+
+
+def _near_positions(
+    positions_a: list[int], len_a: int, positions_b: list[int], len_b: int, distance: int
+) -> bool:
+    return any(_near_pairs(positions_a, len_a, positions_b, len_b, distance))
+
+
+def _near_pairs(
+    positions_a: list[int], len_a: int, positions_b: list[int], len_b: int, distance: int
+) -> tuple[list[int], list[int]]:
+    """
+    Return the positions of A and of B with the other keyword within `distance` characters,
+    counted between the end of one and the start of the other.
+    """
+    near_a, near_b = set(), set()
+    j = 0
+    # both lists are sorted, only the B starting within the window of an A are compared
+    for a in positions_a:
+        while j < len(positions_b) and positions_b[j] + len_b + distance < a:
+            j += 1
+        k = j
+        while k < len(positions_b) and positions_b[k] <= a + len_a + distance:
+            near_a.add(a)
+            near_b.add(positions_b[k])
+            k += 1
+    return sorted(near_a), sorted(near_b)
+
+
+def search_content_query(
+    chapter_list: ChapterList,
+    query: str | ContentQuery,
+    highlight: str = None,
+    context_length: int = 20,
+) -> list[ContentSearchResult]:
+    """
+    Search the chapters with a query of several keywords, each chapter is scanned once.
+
+    Args:
+        query: see `ContentQuery` for the syntax.
+        highlight must be like: "**%s**"
+
+    Return: `list[ContentSearchResult]`
+        the search results' context in content with the keywords, of the matching chapters.
+
+    Raise:
+        if chapter hasn't had content, or the query is malformed.
+    """
+    if isinstance(query, str):
+        query = ContentQuery.parse(query)
+    highlights = {keyword: highlight % keyword if highlight else None for keyword in query.keywords}
+    results = []
+    for chapter in chapter_list:
+        if not chapter.content:
+            raise ChapterNoContentError(f"Chapter '{chapter.name}' hasn't had content")
+        if not (hits := query.search(chapter.content)):
+            continue
+        results.extend(
+            ContentSearchResult(
+                chapter=chapter,
+                keyword=keyword,
+                position=pos,
+                context_length=context_length,
+                highlight=highlights[keyword],
+            )
+            for pos, keyword in hits
+        )
+
+    return results
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from .const import (
+    RATE_LIMIT_RATE,
+    RATE_LIMIT_MIN_RATE,
+    RATE_LIMIT_MAX_RATE,
+    RATE_LIMIT_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY,
+    RATE_LIMIT_DECREASE_WINDOW,
+)
+from .utils.timestamp import now_timestamp
+
+
+class HostRateLimiter:
+    """
+    Token bucket limiter of a single host with AIMD adaptive concurrency.
+
+    Healthy responses grow the rate and the concurrency additively,
+    throttled responses (429 / 5xx) shrink them multiplicatively,
+    at most once per `decrease_window` seconds or one refill interval, whichever is longer,
+    so a burst of throttled responses to the requests in flight counts once.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RATE,
+        min_rate: float = RATE_LIMIT_MIN_RATE,
+        max_rate: float = RATE_LIMIT_MAX_RATE,
+        concurrency: int = RATE_LIMIT_CONCURRENCY,
+        max_concurrency: int = RATE_LIMIT_MAX_CONCURRENCY,
+        decrease_window: float = RATE_LIMIT_DECREASE_WINDOW,
+    ) -> None:
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.decrease_window = decrease_window
+
+        self._concurrency = float(concurrency)
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = float("-inf")
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._concurrency)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(max(self.rate, 1), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _try_acquire(self) -> float | None:
+        """
+        Take a slot, return None if succeeded, else the seconds to wait (inf for a free slot).
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        if self._in_flight >= self.concurrency:
+            return float("inf")
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        self._in_flight += 1
+        return None
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            while (delay := self._try_acquire()) is not None:
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait(), None if delay == float("inf") else delay
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def success(self) -> None:
+        """
+        Additive increase after a healthy response.
+        """
+        self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+        self._concurrency = min(self.max_concurrency, self._concurrency + 1 / self._concurrency)
+
+    def throttle(self, retry_after: float = None) -> None:
+        """
+        Multiplicative decrease after a throttled response.
+        """
+        now = time.monotonic()
+        if now - self._last_decrease >= max(self.decrease_window, 1 / self.rate):
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._concurrency = max(1.0, self._concurrency / 2)
+            self._last_decrease = now
+        self._tokens = 0
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def to_dict(self) -> dict:
+        return {
+            "rate": self.rate,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "blocked": max(self._blocked_until - time.monotonic(), 0),
+        }
+
+    async def __aenter__(self) -> "HostRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.release()
+
+
+class RateLimiter:
+    """
+    Registry of per host limiters.
+    """
+
+    def __init__(self, **options) -> None:
+        self.options = options
+        self._hosts: dict[str, HostRateLimiter] = {}
+
+    def get(self, url: str) -> HostRateLimiter:
+        host = urlsplit(url).netloc
+        if (limiter := self._hosts.get(host)) is None:
+            limiter = self._hosts[host] = HostRateLimiter(**self.options)
+        return limiter
+
+    @property
+    def rates(self) -> dict[str, dict]:
+        return {host: limiter.to_dict() for host, limiter in self._hosts.items()}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse the `Retry-After` header, which is either seconds or a http date.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - now_timestamp(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+rate_limiter = RateLimiter()
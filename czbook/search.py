@@ -24,7 +24,7 @@ async def search(
 ) -> list[SearchResult] | None:
     if not (_by := DICT_SEARCH_BY.get(by)):
         raise ValueError(f'Unknown value "{by}" of by')
-    soup = await fetch_as_html(f"https://czbooks.net/{_by}/{keyword}/{page}")
+    soup = await fetch_as_html(f"https://czbooks.net/{_by}/{keyword}/{page}", page="search")
 
     if not (
         novel_list_ul := soup.find("ul", class_="nav novel-list style-default").find_all(
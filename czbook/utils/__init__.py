@@ -6,4 +6,5 @@ Utils sub-module
 
 # flake8: noqa: F401
 from .timestamp import now_timestamp, time_diff, is_out_of_date
+from .singleflight import SingleFlight
 from .utils import hyper_link_list_to_str, get_code
@@ -0,0 +1,49 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one call.
+
+    Callers that arrive while a call of the key is in flight await the same future.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+    async def do(
+        self,
+        key: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        if (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = self._calls[key] = asyncio.ensure_future(func(*args, **kwargs))
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield the shared call from being cancelled by one of the callers
+        return await asyncio.shield(future)
+
+    async def cancel(self) -> None:
+        """
+        Cancel the calls in flight and wait for them to end.
+        """
+        futures = list(self._calls.values())
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
@@ -1,20 +1,61 @@
 # flake8: noqa: F401
 
+from peewee import chunked, fn
+
 from .db import DATABASE
-from .module import CategoryModule, CategoryType, NovelModule, NovelType
+from .executor import QueryExecutor, LatencyHistogram
+from .write_behind import WriteBehindQueue
+from .migrate import migrate_chapter_list, migrate_compress_contents, migrate_chapter_search
+from .module import (
+    CategoryModule,
+    CategoryType,
+    NovelModule,
+    NovelType,
+    ChapterModule,
+    ChapterType,
+    ChapterContentModule,
+    ChapterContentType,
+    ContentDictionaryModule,
+    ContentDictionaryType,
+    ContentIndexModule,
+    ContentIndexType,
+    ChapterSearchModule,
+    ChapterSearchType,
+)
 
 
 class DataBase:
     NovelModule = NovelModule
     CategoryModule = CategoryModule
+    ChapterModule = ChapterModule
+    ChapterContentModule = ChapterContentModule
+    ContentDictionaryModule = ContentDictionaryModule
+    ContentIndexModule = ContentIndexModule
+    ChapterSearchModule = ChapterSearchModule
 
     def __init__(self) -> None:
         self.database = DATABASE
 
         self.connect()
-        self.database.create_tables([self.NovelModule, self.CategoryModule], safe=True)
+        self.database.create_tables(
+            [
+                self.NovelModule,
+                self.CategoryModule,
+                self.ChapterModule,
+                self.ChapterContentModule,
+                self.ContentDictionaryModule,
+                self.ContentIndexModule,
+                self.ChapterSearchModule,
+            ],
+            safe=True,
+        )
+        migrate_chapter_list(self.database)
+        migrate_compress_contents(self.database)
+        migrate_chapter_search(self.database)
         self.close()
 
+        self.executor = QueryExecutor()
+
     def connect(self):
         self.database.connect()
         return self
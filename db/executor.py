@@ -0,0 +1,79 @@
+import asyncio
+import bisect
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class LatencyHistogram:
+    """
+    Histogram of the query latencies in milliseconds.
+    """
+
+    BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(self.BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "average": self.total / self.count if self.count else 0,
+            "max": self.max,
+            "buckets": {
+                f"<={bucket}ms" if bucket else f">{self.BUCKETS[-1]}ms": count
+                for bucket, count in zip((*self.BUCKETS, None), self.counts)
+                if count
+            },
+        }
+
+
+class QueryExecutor:
+    """
+    Run the blocking database queries off the event loop.
+
+    Reads run on a small thread pool, writes are serialized on one dedicated thread.
+    """
+
+    def __init__(self, read_workers: int = 4) -> None:
+        self._readers = ThreadPoolExecutor(read_workers, thread_name_prefix="db-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+        self.latency: dict[str, LatencyHistogram] = {}
+
+    @property
+    def stats(self) -> dict[str, dict]:
+        return {name: histogram.to_dict() for name, histogram in self.latency.items()}
+
+    async def _run(
+        self, executor: ThreadPoolExecutor, name: str, func: Callable[..., Any], *args: Any
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            self.latency.setdefault(name, LatencyHistogram()).observe(
+                (time.perf_counter() - start) * 1000
+            )
+
+    async def read(self, name: str, func: Callable[..., Any], *args: Any) -> Any:
+        return await self._run(self._readers, name, func, *args)
+
+    async def write(self, name: str, func: Callable[..., Any], *args: Any) -> Any:
+        return await self._run(self._writer, name, func, *args)
+
+    def shutdown(self) -> None:
+        """
+        Wait for the pending queries and stop the threads.
+        """
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
@@ -0,0 +1,113 @@
+"""
+Migrations of the database schema.
+"""
+
+import json
+
+from peewee import chunked
+from playhouse.migrate import SqliteMigrator, migrate
+from playhouse.sqlite_ext import SqliteDatabase
+
+from czbook.compress import compress, decompress
+
+from .module import (
+    NovelModule,
+    ChapterModule,
+    ChapterContentModule,
+    ContentDictionaryModule,
+    ChapterSearchModule,
+)
+
+
+def migrate_chapter_list(database: SqliteDatabase) -> None:
+    """
+    Move the JSON `chapter_list` column of the novel table
+    into the chapter table and the chapter content table.
+    """
+    table = NovelModule._meta.table_name
+    if "chapter_list" not in (column.name for column in database.get_columns(table)):
+        return
+
+    with database.atomic():
+        cursor = database.execute_sql(f"SELECT novel_id, chapter_list FROM {table}")
+        for novel_id, chapter_list in cursor.fetchall():
+            chapters = json.loads(chapter_list or "[]")
+            ChapterModule.delete().where(ChapterModule.novel_id == novel_id).execute()
+            for batch in chunked(
+                (
+                    {
+                        "novel_id": novel_id,
+                        "index": index,
+                        "name": chapter.get("name"),
+                        "url": chapter.get("url"),
+                    }
+                    for index, chapter in enumerate(chapters)
+                ),
+                500,
+            ):
+                ChapterModule.insert_many(batch).execute()
+            for batch in chunked(
+                (
+                    {
+                        "novel_id": novel_id,
+                        "url": chapter.get("url"),
+                        "content": compress(chapter["content"]),
+                    }
+                    for chapter in chapters
+                    if chapter.get("content") is not None
+                ),
+                500,
+            ):
+                ChapterContentModule.insert_many(batch).on_conflict("replace").execute()
+
+        migrate(SqliteMigrator(database).drop_column(table, "chapter_list"))
+
+
+def migrate_compress_contents(database: SqliteDatabase) -> None:
+    """
+    Compress the chapter contents stored as plain text.
+    """
+    table = ChapterContentModule._meta.table_name
+    with database.atomic():
+        cursor = database.execute_sql(
+            f"SELECT id, content FROM {table} WHERE typeof(content) = 'text'"
+        )
+        for id, content in cursor.fetchall():
+            ChapterContentModule.update(content=compress(content)).where(
+                ChapterContentModule.id == id
+            ).execute()
+
+
+def migrate_chapter_search(database: SqliteDatabase) -> None:
+    """
+    Index the chapter contents downloaded before the search table existed.
+    """
+    if ChapterSearchModule.select().exists() or not ChapterContentModule.select().exists():
+        return
+
+    dictionaries = {data.novel_id: bytes(data.data) for data in ContentDictionaryModule.select()}
+    names = {
+        (chapter.novel_id, chapter.url): chapter.name
+        for chapter in ChapterModule.select(
+            ChapterModule.novel_id, ChapterModule.url, ChapterModule.name
+        )
+    }
+    with database.atomic():
+        for batch in chunked(
+            (
+                {
+                    ChapterSearchModule.rowid: ChapterSearchModule.chapter_rowid(
+                        data.novel_id, data.url
+                    ),
+                    ChapterSearchModule.novel_id: data.novel_id,
+                    ChapterSearchModule.name: names.get((data.novel_id, data.url), ""),
+                    ChapterSearchModule.url: data.url,
+                    ChapterSearchModule.content: decompress(
+                        bytes(data.content), dictionaries.get(data.novel_id)
+                    ),
+                }
+                for data in ChapterContentModule.select().iterator()
+            ),
+            100,
+        ):
+            ChapterSearchModule.insert_many(batch).on_conflict("replace").execute()
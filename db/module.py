@@ -1,8 +1,14 @@
+import hashlib
+
 from typing import TypedDict
 
 from playhouse.sqlite_ext import (
+    FTS5Model,
+    SearchField,
     Model,
+    CompositeKey,
     IntegerField,
+    BlobField,
     CharField,
     TextField,
     JSONField,
@@ -44,7 +50,6 @@ class NovelModule(BaseModel):
     views = IntegerField(null=False, default=0)
     category = ForeignKeyField(CategoryModule, backref="NovelModule")
     hashtags = TextField(null=False)
-    chapter_list = TextField(null=False)
     word_count = IntegerField(null=True)
 
 
@@ -61,5 +66,101 @@ class NovelType(TypedDict):
     views: int
     category: CategoryType
     hashtags: str
-    chapter_list: str
     word_count: int | None
+
+
+class ChapterModule(BaseModel):
+    """chapter data model"""
+
+    novel_id = CharField(null=False)
+    index = IntegerField(null=False)
+    name = CharField(null=False)
+    url = CharField(null=False)
+
+    class Meta:
+        primary_key = CompositeKey("novel_id", "index")
+
+
+class ChapterType(TypedDict):
+    """chapter data model type"""
+
+    novel_id: str
+    index: int
+    name: str
+    url: str
+
+
+class ChapterContentModule(BaseModel):
+    """chapter content data model"""
+
+    novel_id = CharField(null=False, index=True)
+    url = CharField(null=False)
+    content = BlobField(null=False)  # compressed
+
+    class Meta:
+        indexes = ((("novel_id", "url"), True),)
+
+
+class ChapterContentType(TypedDict):
+    """chapter content data model type"""
+
+    novel_id: str
+    url: str
+    content: bytes
+
+
+class ContentDictionaryModule(BaseModel):
+    """shared compression dictionary of a novel's chapter contents"""
+
+    novel_id = CharField(null=False, unique=True, index=True)
+    data = BlobField(null=False)
+
+
+class ContentDictionaryType(TypedDict):
+    """content dictionary data model type"""
+
+    novel_id: str
+    data: bytes
+
+
+class ContentIndexModule(BaseModel):
+    """bigram index of a novel's chapter contents"""
+
+    novel_id = CharField(null=False, unique=True, index=True)
+    data = BlobField(null=False)
+
+
+class ContentIndexType(TypedDict):
+    """content index data model type"""
+
+    novel_id: str
+    data: bytes
+
+
+class ChapterSearchModule(FTS5Model):
+    """full-text search index of the chapter contents, tokenized into trigrams"""
+
+    novel_id = SearchField(unindexed=True)
+    name = SearchField(unindexed=True)
+    url = SearchField(unindexed=True)
+    content = SearchField()
+
+    class Meta:
+        database = DATABASE
+        options = {"tokenize": "trigram"}
+
+    @staticmethod
+    def chapter_rowid(novel_id: str, url: str) -> int:
+        """the rowid of a chapter, so it's replaced and deleted without a scan"""
+        return int.from_bytes(
+            hashlib.sha1(f"{novel_id}\n{url}".encode()).digest()[:8], "big", signed=True
+        )
+
+
+class ChapterSearchType(TypedDict):
+    """chapter search data model type"""
+
+    novel_id: str
+    name: str
+    url: str
+    content: str
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from typing import Any, Awaitable, Callable, Hashable
+
+from .executor import LatencyHistogram
+
+
+class WriteBehindQueue:
+    """
+    Coalesce the writes by key and flush them in batches,
+    every `interval` seconds or as soon as `max_items` are pending.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list[Any]], Awaitable[None]],
+        interval: float = 0.5,
+        max_items: int = 50,
+    ) -> None:
+        self._flush = flush
+        self.interval = interval
+        self.max_items = max_items
+
+        self.pending: dict[Hashable, Any] = {}
+        self._full = asyncio.Event()
+        self._task: asyncio.Task = None
+        self._lock = asyncio.Lock()
+        self._closing = False
+
+        self.coalesced = 0
+        self.flushed = 0
+        self.flush_latency = LatencyHistogram()
+
+    @property
+    def depth(self) -> int:
+        return len(self.pending)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "flush_latency": self.flush_latency.to_dict(),
+        }
+
+    def put(self, key: Hashable, item: Any) -> None:
+        if key in self.pending:
+            self.coalesced += 1
+        self.pending[key] = item
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if len(self.pending) >= self.max_items:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while self.pending and not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error when flushing the write-behind queue: {e}")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            self._full.clear()
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            start = time.perf_counter()
+            try:
+                await self._flush(list(pending.values()))
+            except BaseException:
+                # keep the failed or cancelled writes unless they have been superseded
+                self.pending = {**pending, **self.pending}
+                raise
+            self.flush_latency.observe((time.perf_counter() - start) * 1000)
+            self.flushed += len(pending)
+
+    async def close(self) -> None:
+        """
+        Stop the background task after its running flush, then flush the pending writes.
+        """
+        self._closing = True
+        self._full.set()
+        if self._task is not None:
+            await asyncio.wait([self._task])
+            self._task = None
+        await self.flush()
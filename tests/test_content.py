@@ -0,0 +1,101 @@
+import asyncio
+import importlib
+
+import czbook
+from czbook import content
+
+from test_export import CHAPTER_LENGTH, _novel
+
+
+def test_failed_chapters_are_retried(monkeypatch):
+    fetched = []
+
+    async def fetch_as_text(url: str, *args, **kwargs) -> str:
+        fetched.append(url)
+        if url.endswith("/1") and fetched.count(url) == 1:
+            raise czbook.TooManyRequestsError("429 Too many requests")
+        return "<div class='content'>內容</div>"
+
+    monkeypatch.setattr(content, "fetch_as_text", fetch_as_text)
+
+    async def main():
+        novel = _novel()
+        for chapter in novel.chapter_list[:3]:
+            chapter.content = None
+        novel.chapter_list = czbook.ChapterList(novel.chapter_list[:3])
+
+        state = novel.get_content(workers=2)
+        await state.task
+        await asyncio.sleep(0)
+        first = (novel.content_cache, novel.chapter_list[1]._error is not None, len(fetched))
+
+        retry = novel.get_content(workers=2)
+        await retry.task
+        await asyncio.sleep(0)
+        return first, retry is not state, novel.content_cache, len(fetched)
+
+    assert asyncio.run(main()) == ((False, True, 3), True, True, 4)
+
+
+def test_chapters_which_failed_to_save_are_downloaded_again(monkeypatch):
+    async def fetch_as_text(url: str, *args, **kwargs) -> str:
+        return "<div class='content'>內容</div>"
+
+    monkeypatch.setattr(content, "fetch_as_text", fetch_as_text)
+    saved = []
+
+    def on_chapter(chapter: czbook.ChapterInfo) -> None:
+        if not saved:
+            saved.append(None)
+            raise RuntimeError("database is locked")
+        saved.append(chapter.url)
+
+    async def main():
+        chapter_list = czbook.ChapterList(
+            [czbook.ChapterInfo("第1章", "https://czbooks.net/n/x/1")]
+        )
+        state = content.GetContent.start(chapter_list, 1, on_chapter)
+        await state.task
+        failed = (state.finished, chapter_list[0]._error)
+        await content.GetContent.start(chapter_list, 1, on_chapter).task
+        return failed, chapter_list[0]._error
+
+    assert asyncio.run(main()) == ((True, "database is locked"), None)
+    assert saved == [None, "https://czbooks.net/n/x/1"]
+
+
+def test_update_keeps_the_stored_word_count(monkeypatch):
+    stored = _novel()
+
+    async def fetch_novel(*args, **kwargs) -> czbook.Novel:
+        updated = _novel()
+        updated.info.last_update = "2024-02-01"
+        return updated
+
+    monkeypatch.setattr(importlib.import_module("czbook.czbook"), "fetch_novel", fetch_novel)
+
+    def loaded_from_database() -> czbook.Novel:
+        novel = _novel()
+        for chapter in novel.chapter_list:
+            chapter.content = None
+        return novel
+
+    async def load_contents(novel: czbook.Novel) -> None:
+        for chapter, content in zip(novel.chapter_list, stored.chapter_list):
+            chapter.content = content.content
+
+    async def main():
+        novel = loaded_from_database()
+        await novel.update(2)
+        unloaded = (novel.word_count, novel.content_cache)
+
+        novel = loaded_from_database()
+        changes = await novel.update(2, load_contents)
+        return unloaded, len(changes.rechecked_chapters), novel.word_count, novel.content_cache
+
+    assert asyncio.run(main()) == (
+        (stored.word_count, False),
+        2,
+        stored.word_count - 2 * CHAPTER_LENGTH,
+        False,
+    )
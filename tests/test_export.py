@@ -0,0 +1,66 @@
+import io
+import tracemalloc
+
+import czbook
+import utils.czbook
+from utils.czbook import Novel
+
+CHAPTERS = 100
+CHAPTER_LENGTH = 20000
+
+
+def _novel() -> Novel:
+    info = czbook.NovelInfo(
+        id="test",
+        title="標題",
+        description="簡介",
+        thumbnail=None,
+        author=czbook.Author("作者"),
+        state="已完結",
+        last_update="2024-01-01",
+        views=0,
+        category=czbook.Category("分類", "https://czbooks.net/c/test"),
+        hashtags=czbook.HashtagList.from_list([]),
+    )
+    chapter_list = czbook.ChapterList(
+        [
+            czbook.ChapterInfo(
+                f"第{i}章", f"https://czbooks.net/n/test/{i}", f"{i}" + "字" * CHAPTER_LENGTH
+            )
+            for i in range(CHAPTERS)
+        ]
+    )
+    return Novel("test", info, chapter_list, word_count=CHAPTERS * CHAPTER_LENGTH)
+
+
+def _peak(func) -> tuple[object, int]:
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_content_matches_content():
+    novel = _novel()
+    assert "".join(novel.iter_content()) == novel.content
+
+    buffer = io.StringIO()
+    novel.write_content(buffer)
+    assert buffer.getvalue() == novel.content
+
+
+def test_filelike_content_peak_memory(monkeypatch):
+    monkeypatch.setattr(utils.czbook, "CONTENT_SPOOL_MAX_SIZE", 1024 * 1024)
+    novel = _novel()
+    expected = novel.content.encode()
+
+    _, joined_peak = _peak(lambda: novel.content.encode())
+    file, streamed_peak = _peak(lambda: novel.filelike_content)
+    with file:
+        assert file.read() == expected
+
+    # spooled to disk past the limit, instead of several copies of the whole text
+    assert streamed_peak < 2 * 1024 * 1024
+    assert streamed_peak < joined_peak / 4
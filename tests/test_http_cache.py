@@ -0,0 +1,36 @@
+import asyncio
+
+from czbook.cache import CacheEntry, HttpCache
+
+
+def test_round_trip(tmp_path):
+    async def main():
+        cache = HttpCache(tmp_path, compress=True)
+        await cache.put(CacheEntry("https://czbooks.net/n/a", "內容", etag='"a"'))
+        await cache.put(CacheEntry("https://czbooks.net/n/b", b"\x89PNG", last_modified="x"))
+        await cache.put(CacheEntry("https://czbooks.net/n/c", "no validators"))
+        return [
+            await HttpCache(tmp_path).get(url)
+            for url in (
+                "https://czbooks.net/n/a",
+                "https://czbooks.net/n/b",
+                "https://czbooks.net/n/c",
+            )
+        ]
+
+    a, b, c = asyncio.run(main())
+    assert (a.content, a.validators) == ("內容", {"If-None-Match": '"a"'})
+    assert (b.content, b.validators) == (b"\x89PNG", {"If-Modified-Since": "x"})
+    assert c is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    async def main():
+        cache = HttpCache(tmp_path, max_size=400, compress=False)
+        for name in "abc":
+            await cache.put(CacheEntry(f"https://czbooks.net/n/{name}", "x" * 50, etag=name))
+            # keep a as the most recently used
+            await cache.get("https://czbooks.net/n/a")
+        return [await cache.get(f"https://czbooks.net/n/{name}") is not None for name in "abc"]
+
+    assert asyncio.run(main()) == [True, False, True]
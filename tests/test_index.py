@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+import czbook
+from czbook import ContentIndex, search_content
+
+ALPHABET = "天地玄黃宇宙洪荒 \n"
+
+
+def _chapter_list(rng: random.Random) -> czbook.ChapterList:
+    return czbook.ChapterList(
+        [
+            czbook.ChapterInfo(
+                f"第{i}章",
+                f"https://czbooks.net/n/test/{i}",
+                "".join(rng.choices(ALPHABET, k=rng.randint(1, 300))),
+            )
+            for i in range(rng.randint(1, 8))
+        ]
+    )
+
+
+def _hits(results: list[czbook.ContentSearchResult]) -> list[tuple[str, int]]:
+    return [(result.chapter.url, result._position) for result in results]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_index_matches_scan(seed):
+    rng = random.Random(seed)
+    chapter_list = _chapter_list(rng)
+    index = ContentIndex.build(chapter_list)
+    for _ in range(5):
+        keyword = "".join(rng.choices(ALPHABET[:8], k=rng.randint(1, 4)))
+        assert _hits(search_content(chapter_list, keyword, index=index)) == _hits(
+            search_content(chapter_list, keyword)
+        )
+
+
+def test_round_trip():
+    chapter_list = _chapter_list(random.Random(0))
+    index = ContentIndex.from_bytes(ContentIndex.build(chapter_list).to_bytes())
+    assert index.matches(chapter_list)
+    assert _hits(search_content(chapter_list, "宇宙", index=index)) == _hits(
+        search_content(chapter_list, "宇宙")
+    )
+
+
+def test_index_of_other_chapters_is_not_used():
+    index = ContentIndex.build(_chapter_list(random.Random(0)))
+    chapter_list = _chapter_list(random.Random(1))
+    assert not index.matches(chapter_list)
+    assert _hits(search_content(chapter_list, "宇宙", index=index)) == _hits(
+        search_content(chapter_list, "宇宙")
+    )
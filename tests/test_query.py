@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from czbook import ContentQuery, InvalidQueryError
+
+ALPHABET = "天地玄黃宇宙"
+
+
+def _positions(text: str, keyword: str) -> list[int]:
+    # every occurrence after the first character, overlapping ones included
+    return [pos for pos in range(1, len(text)) if text.startswith(keyword, pos)]
+
+
+def _near(a: int, len_a: int, b: int, len_b: int, distance: int) -> bool:
+    return b <= a + len_a + distance and a <= b + len_b + distance
+
+
+def _brute_force(query: ContentQuery, text: str) -> list[tuple[int, str]] | None:
+    positions = {keyword: _positions(text, keyword) for keyword in query.keywords}
+    shown: dict[str, set[int]] = {}
+    matched = False
+    for group in query.groups:
+        if not all(positions[keyword] for keyword in group.include):
+            continue
+        if any(positions[keyword] for keyword in group.exclude):
+            continue
+        near: dict[str, set[int]] = {}
+        for a, b, distance in group.near:
+            for pos_a in positions[a]:
+                for pos_b in positions[b]:
+                    if _near(pos_a, len(a), pos_b, len(b), distance):
+                        near.setdefault(a, set()).add(pos_a)
+                        near.setdefault(b, set()).add(pos_b)
+        if any(a not in near for a, _, _ in group.near):
+            continue
+        matched = True
+        for keyword in group.include:
+            shown.setdefault(keyword, set()).update(near.get(keyword, positions[keyword]))
+    if not matched:
+        return None
+    return sorted((pos, keyword) for keyword, found in shown.items() for pos in found)
+
+
+def _random_query(rng: random.Random) -> str:
+    groups = []
+    for _ in range(rng.randint(1, 3)):
+        tokens = []
+        for i in range(rng.randint(1, 3)):
+            keyword = "".join(rng.choices(ALPHABET, k=rng.randint(1, 3)))
+            if i and rng.random() < 0.3:
+                tokens.append(f"NEAR/{rng.randint(0, 20)}")
+            tokens.append(keyword)
+        if rng.random() < 0.3:
+            tokens.append("-" + "".join(rng.choices(ALPHABET, k=rng.randint(1, 3))))
+        groups.append(" ".join(tokens))
+    return " | ".join(groups)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_query_matches_brute_force(seed):
+    rng = random.Random(seed)
+    query = ContentQuery.parse(_random_query(rng))
+    text = "".join(rng.choices(ALPHABET, k=rng.randint(1, 200)))
+    assert query.search(text) == _brute_force(query, text)
+
+
+def test_parse():
+    query = ContentQuery.parse("天地 -玄黃 | 宇宙 NEAR/10 洪荒")
+    assert [(group.include, group.exclude, group.near) for group in query.groups] == [
+        (["天地"], ["玄黃"], []),
+        (["宇宙", "洪荒"], [], [("宇宙", "洪荒", 10)]),
+    ]
+
+
+@pytest.mark.parametrize(
+    "query", ["", "-天地", "天地 |", "NEAR 天地", "天地 NEAR", "天地 NEAR -玄黃"]
+)
+def test_parse_invalid(query):
+    with pytest.raises(InvalidQueryError):
+        ContentQuery.parse(query)
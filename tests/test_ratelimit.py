@@ -0,0 +1,22 @@
+from czbook.ratelimit import HostRateLimiter
+
+
+def test_burst_of_throttles_decreases_once():
+    limiter = HostRateLimiter(rate=5, concurrency=8)
+    for _ in range(8):
+        limiter.throttle()
+    assert (limiter.rate, limiter.concurrency) == (2.5, 4)
+
+
+def test_throttle_after_window_decreases_again():
+    limiter = HostRateLimiter(rate=5, concurrency=8, decrease_window=1)
+    limiter.throttle()
+    limiter._last_decrease -= 1
+    limiter.throttle()
+    assert (limiter.rate, limiter.concurrency) == (1.25, 2)
+
+
+def test_success_increases_additively():
+    limiter = HostRateLimiter(rate=2, concurrency=2)
+    limiter.success()
+    assert (limiter.rate, limiter._concurrency) == (2.5, 2.5)
@@ -0,0 +1,41 @@
+import asyncio
+
+from db import WriteBehindQueue
+
+
+def test_close_waits_for_the_running_flush():
+    written = []
+
+    async def flush(items: list) -> None:
+        await asyncio.sleep(0.05)
+        written.extend(items)
+
+    async def main():
+        queue = WriteBehindQueue(flush, interval=0, max_items=2)
+        queue.put("a", 1)
+        queue.put("b", 2)
+        await asyncio.sleep(0.01)
+        # put while the first batch is being flushed
+        queue.put("c", 3)
+        await queue.close()
+        return queue.depth
+
+    assert asyncio.run(main()) == 0
+    assert sorted(written) == [1, 2, 3]
+
+
+def test_cancelled_flush_keeps_the_pending_writes():
+    async def flush(items: list) -> None:
+        await asyncio.sleep(1)
+
+    async def main():
+        queue = WriteBehindQueue(flush)
+        queue.put("a", 1)
+        task = asyncio.create_task(queue.flush())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.wait([task])
+        queue._task.cancel()
+        return queue.pending
+
+    assert asyncio.run(main()) == {"a": 1}
@@ -0,0 +1,92 @@
+"""
+In-memory cache of the novels.
+"""
+
+from collections import OrderedDict
+
+import czbook
+
+
+class NovelCache:
+    """
+    LRU cache of novels bounded by their estimated size in bytes.
+
+    Novels whose content is being downloaded are pinned and never evicted.
+    """
+
+    def __init__(self, max_size: int = 256 * 1024 * 1024) -> None:
+        self.max_size = max_size
+        self._novels: OrderedDict[str, czbook.Novel] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "novels": len(self),
+            "size": self.size,
+        }
+
+    @staticmethod
+    def is_pinned(novel: czbook.Novel) -> bool:
+        return bool(novel._get_content_state and not novel._get_content_state.finished)
+
+    def get(self, id: str) -> czbook.Novel | None:
+        if (novel := self._novels.get(id)) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._novels.move_to_end(id)
+        return novel
+
+    def __setitem__(self, id: str, novel: czbook.Novel) -> None:
+        # the size is estimated again, since the content may have been downloaded
+        self._size -= self._sizes.get(id, 0)
+        self._novels[id] = novel
+        self._novels.move_to_end(id)
+        self._sizes[id] = novel.estimated_size
+        self._size += self._sizes[id]
+        self._evict()
+
+    def resize(self, novel: czbook.Novel) -> None:
+        """
+        Estimate the size of a cached novel again,
+        after its content was loaded or decompressed to be exported or searched.
+        """
+        if self._novels.get(novel.id) is novel:
+            self[novel.id] = novel
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._novels
+
+    def __len__(self) -> int:
+        return len(self._novels)
+
+    def pop(self, id: str, default: czbook.Novel = None) -> czbook.Novel | None:
+        if (novel := self._novels.pop(id, None)) is None:
+            return default
+        self._size -= self._sizes.pop(id)
+        return novel
+
+    def values(self) -> list[czbook.Novel]:
+        return list(self._novels.values())
+
+    def _evict(self) -> None:
+        for id in list(self._novels):
+            if self._size <= self.max_size:
+                break
+            if self.is_pinned(self._novels[id]):
+                continue
+            self.pop(id)
+            self.evictions += 1
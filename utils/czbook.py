@@ -1,11 +1,18 @@
-import io
 import random
 import json
+import tempfile
+
+from typing import IO
 
 from discord import Embed, Colour
 
 import czbook
 
+# exported content larger than this is spooled to a temporary file instead of the memory
+CONTENT_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # 8MB
+# embed color while the theme colors of the thumbnail are being extracted
+THEME_COLOR_PLACEHOLDER = Colour.dark_theme()
+
 
 class Novel(czbook.Novel):
     _overview_embed_cache: Embed = None
@@ -13,11 +20,11 @@ class Novel(czbook.Novel):
     _comment_embed_cache: Embed = None
 
     def get_theme_color(self) -> Colour:
-        return (
-            Colour(random.choice(self.thumbnail.theme_color))
-            if self.thumbnail
-            else Colour.random()
-        )
+        if not self.thumbnail:
+            return Colour.random()
+        if not self.thumbnail.has_theme_color:
+            return THEME_COLOR_PLACEHOLDER
+        return Colour(random.choice(self.thumbnail.theme_color))
 
     def overview_embed(self, from_cache: bool = True) -> Embed:
         if self._overview_embed_cache and from_cache:
@@ -91,8 +98,12 @@ class Novel(czbook.Novel):
         self._overview_embed_cache = None
 
     @property
-    def filelike_content(self) -> io.StringIO:
-        return io.StringIO(self.content)
+    def filelike_content(self) -> IO[bytes]:
+        file = tempfile.SpooledTemporaryFile(max_size=CONTENT_SPOOL_MAX_SIZE, mode="w+b")
+        for chunk in self.iter_content():
+            file.write(chunk.encode())
+        file.seek(0)
+        return file
 
     @classmethod
     def load_from_json(cls: type["Novel"], data: dict) -> "Novel":
@@ -135,11 +146,3 @@ def hashtag_list_to_str(hashtags: czbook.HashtagList) -> str:
 
 def hashtag_str_to_list(s: str) -> czbook.HashtagList:
     return czbook.HashtagList([czbook.Hashtag(item) for item in json.loads(s)])
-
-
-def chapter_list_to_str(chapter_list: czbook.ChapterList) -> str:
-    return json.dumps([item.to_dict() for item in chapter_list], ensure_ascii=False)
-
-
-def chapter_str_to_list(s: str) -> czbook.ChapterList:
-    return czbook.ChapterList.from_json(json.loads(s))
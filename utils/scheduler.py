@@ -0,0 +1,186 @@
+"""
+Background refresh of the novels people keep asking for.
+"""
+
+import asyncio
+import math
+import random
+from typing import TYPE_CHECKING
+
+from czbook import NovelChanges
+from czbook.utils import now_timestamp
+
+from utils.czbook import Novel
+
+if TYPE_CHECKING:
+    from bot import DataBase
+
+
+class NovelStats:
+    """
+    Request popularity and observed update cadence of a novel.
+    """
+
+    __slots__ = ("score", "scored_at", "changed_at", "interval")
+
+    def __init__(self) -> None:
+        self.score = 0.0
+        self.scored_at = 0.0
+        # when a refresh last saw the novel change, and the smoothed time between changes
+        self.changed_at = 0.0
+        self.interval: float | None = None
+
+    def popularity(self, now: float, half_life: float) -> float:
+        return self.score * 0.5 ** ((now - self.scored_at) / half_life)
+
+    def hit(self, now: float, half_life: float) -> None:
+        self.score = self.popularity(now, half_life) + 1
+        self.scored_at = now
+
+    def changed(self, now: float) -> None:
+        if self.changed_at:
+            interval = now - self.changed_at
+            self.interval = (
+                interval if self.interval is None else 0.7 * self.interval + 0.3 * interval
+            )
+        self.changed_at = now
+
+
+class RefreshScheduler:
+    """
+    Refresh hot, ongoing novels before anyone asks for them.
+
+    Novels are ranked by their decayed request count times how overdue they are, where a
+    novel is due after its observed update cadence (bounded by `min_interval` and
+    `max_interval`), or `finished_interval` once it is finished. At most `budget` refreshes
+    are made per hour, and each tick is jittered so refreshes don't line up.
+    """
+
+    def __init__(
+        self,
+        db: "DataBase",
+        budget: int = 60,
+        tick: float = 60,
+        min_popularity: float = 2,
+        half_life: float = 86400,
+        min_interval: float = 1800,
+        max_interval: float = 86400,
+        finished_interval: float = 7 * 86400,
+        max_tracked: int = 10000,
+    ) -> None:
+        self.db = db
+        self.budget = budget
+        self.tick = tick
+        self.min_popularity = min_popularity
+        self.half_life = half_life
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.finished_interval = finished_interval
+        self.max_tracked = max_tracked
+
+        self._novels: dict[str, NovelStats] = {}
+        self._allowance = 0.0
+        self._task: asyncio.Task | None = None
+
+        self.ticks = 0
+        self.refreshes = 0
+        self.updated = 0
+        self.errors = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._novels),
+            "ticks": self.ticks,
+            "refreshes": self.refreshes,
+            "updated": self.updated,
+            "errors": self.errors,
+        }
+
+    def record_request(self, id: str) -> None:
+        if (stats := self._novels.get(id)) is None:
+            if len(self._novels) >= self.max_tracked:
+                self._forget_coldest()
+            stats = self._novels[id] = NovelStats()
+        stats.hit(now_timestamp(), self.half_life)
+
+    async def on_novel_refreshed(self, novel: Novel, changes: NovelChanges) -> None:
+        if "last_update" in changes.fields and (stats := self._novels.get(novel.id)):
+            stats.changed(now_timestamp())
+
+    def refresh_interval(self, novel: Novel) -> float:
+        if novel.state == "已完結":
+            return self.finished_interval
+        stats = self._novels.get(novel.id)
+        interval = stats.interval if stats and stats.interval else self.db.is_stale_after(novel)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def priority(self, novel: Novel, now: float) -> float:
+        """
+        Return how much refreshing the novel is worth, 0 if it doesn't need it.
+        """
+        if not (stats := self._novels.get(novel.id)):
+            return 0
+        if (popularity := stats.popularity(now, self.half_life)) < self.min_popularity:
+            return 0
+        if (overdue := (now - novel.last_fetch_time) / self.refresh_interval(novel)) < 1:
+            return 0
+        return popularity * overdue
+
+    def candidates(self, limit: int) -> list[Novel]:
+        now = now_timestamp()
+        ranked = []
+        for novel in self.db.cache.values():
+            if self.db.cache.is_pinned(novel):
+                continue
+            if (priority := self.priority(novel, now)) > 0:
+                ranked.append((priority, novel))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [novel for _, novel in ranked[:limit]]
+
+    async def run_once(self) -> None:
+        self.ticks += 1
+        self._allowance = min(self._allowance + self.budget * self.tick / 3600, self.budget)
+        for novel in self.candidates(math.floor(self._allowance)):
+            self._allowance -= 1
+            self.refreshes += 1
+            try:
+                if await self.db.refresh_novel(novel):
+                    self.updated += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error when refreshing {novel.id} in background: {e}")
+            # spread the refreshes of a tick
+            await asyncio.sleep(random.uniform(0, self.tick / 10))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick * random.uniform(0.5, 1.5))
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error in refresh scheduler: {e}")
+
+    def start(self) -> None:
+        if self.budget <= 0 or (self._task and not self._task.done()):
+            return
+        if self.on_novel_refreshed not in self.db.refresh_listeners:
+            self.db.refresh_listeners.append(self.on_novel_refreshed)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.on_novel_refreshed in self.db.refresh_listeners:
+            self.db.refresh_listeners.remove(self.on_novel_refreshed)
+
+    def _forget_coldest(self) -> None:
+        now = now_timestamp()
+        coldest = min(self._novels, key=lambda id: self._novels[id].popularity(now, self.half_life))
+        del self._novels[coldest]